@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        """Consume `cost` tokens; returns 0 on success, else seconds until they are available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if cost > self.burst:
+            # Can never be satisfied in one go; report the time to refill fully
+            return max((self.burst - self.tokens) / self.rate, 1.0)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class Pool:
+    """
+    Bounded concurrency pool with a bounded wait queue.
+
+    Requests beyond `concurrency` wait for a slot; once `max_queue` are already
+    waiting, or a slot does not free up within `queue_timeout`, the request is
+    rejected with 503 and a Retry-After derived from the queue depth.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float,
+                 yield_to: "Pool | None" = None):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Lower-priority pools hold back while the pool they yield to has requests queued
+        self.yield_to = yield_to
+        self.active = 0
+        self.waiting = 0
+        self.avg_duration = 1.0  # EWMA of slot hold time, seconds
+        self._slots = asyncio.Semaphore(concurrency)
+
+    def retry_after(self) -> int:
+        """Rough time until a newly queued request would get a slot"""
+        backlog = self.waiting + self.active
+        return max(1, round(backlog * self.avg_duration / self.concurrency))
+
+    def _overloaded(self, reason: str) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"Server busy ({self.name}): {reason}, please retry later",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    async def _wait_for_slot(self):
+        while self.yield_to is not None and self.yield_to.waiting > 0:
+            await asyncio.sleep(0.05)
+        await self._slots.acquire()
+
+    def check_capacity(self):
+        """Raise 503 if a new request would not even fit in the queue"""
+        if self.waiting >= self.max_queue and self._slots.locked():
+            raise self._overloaded(f"{self.waiting} requests queued")
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check_capacity()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._wait_for_slot(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._overloaded(f"no free slot within {self.queue_timeout:.0f}s")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.avg_duration = 0.8 * self.avg_duration + 0.2 * (time.monotonic() - started)
+            self._slots.release()
+
+
+class AdmissionController:
+    """
+    Admission layer for the synchronous API endpoints.
+
+    Each kind of work ("query", "ingest", "batch") gets its own bounded pool and
+    its own per-client token buckets, so a burst of uploads cannot starve
+    interactive queries or exhaust memory and OpenAI quota. Bulk work (ingest,
+    batch queries) yields to queued queries. Limits apply per process.
+    """
+
+    MAX_TRACKED_CLIENTS = 10_000
+
+    def __init__(self, pools: dict[str, Pool], rates: dict[str, tuple[float, float]]):
+        self.pools = pools
+        self.rates = rates  # kind -> (tokens per second, burst)
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        query = Pool(
+            "query",
+            concurrency=int(_env_float("QUERY_CONCURRENCY", 8)),
+            max_queue=int(_env_float("QUERY_QUEUE_SIZE", 32)),
+            queue_timeout=_env_float("QUERY_QUEUE_TIMEOUT", 10)
+        )
+        ingest = Pool(
+            "ingest",
+            concurrency=int(_env_float("INGEST_CONCURRENCY", 2)),
+            max_queue=int(_env_float("INGEST_QUEUE_SIZE", 4)),
+            queue_timeout=_env_float("INGEST_QUEUE_TIMEOUT", 30),
+            yield_to=query
+        )
+        batch = Pool(
+            "batch",
+            concurrency=int(_env_float("BATCH_CONCURRENCY", 1)),
+            max_queue=int(_env_float("BATCH_QUEUE_SIZE", 2)),
+            queue_timeout=_env_float("BATCH_QUEUE_TIMEOUT", 60),
+            yield_to=query
+        )
+        rates = {
+            "query": (_env_float("QUERY_RATE_PER_MIN", 30) / 60, _env_float("QUERY_BURST", 10)),
+            "ingest": (_env_float("INGEST_RATE_PER_MIN", 6) / 60, _env_float("INGEST_BURST", 3)),
+            "batch": (_env_float("BATCH_RATE_PER_MIN", 2) / 60, _env_float("BATCH_BURST", 2)),
+        }
+        return cls({"query": query, "ingest": ingest, "batch": batch}, rates)
+
+    def _bucket(self, kind: str, client_id: str) -> TokenBucket:
+        key = (kind, client_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*self.rates[kind])
+            if len(self._buckets) > self.MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def check(self, kind: str, client_id: str, cost: float = 1):
+        """Charge the client's bucket and check pool capacity, raising 429/503 on rejection"""
+        self.pools[kind].check_capacity()
+        wait = self._bucket(kind, client_id).take(cost)
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for {kind} requests",
+                headers={"Retry-After": str(max(1, round(wait)))}
+            )
+
+    @asynccontextmanager
+    async def admit(self, kind: str, client_id: str, cost: float = 1):
+        self.check(kind, client_id, cost)
+        async with self.pools[kind].slot():
+            yield
+
+
+def client_id(request: Request) -> str:
+    """
+    Identify the caller for rate limiting.
+
+    Behind TRUSTED_PROXY_HOPS proxies (default 1, e.g. Render's), each proxy appends
+    the address it saw to X-Forwarded-For, so the caller is that many hops from the
+    right; anything to the left of it was sent by the client and can be forged.
+    """
+    hops = int(os.getenv("TRUSTED_PROXY_HOPS", 1))
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if hops > 0 and len(forwarded) >= hops:
+        return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
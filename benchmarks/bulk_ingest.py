@@ -0,0 +1,99 @@
+"""
+Bulk-load throughput and query latency during the load, with and without
+`bulk_ingest()` (deferred index maintenance).
+
+Loads random vectors in upsert-sized batches into a fresh collection while a
+background thread keeps searching, then reports points/s and search p50/p95
+seen during the load.
+
+    QDRANT_URL=http://localhost:6333 python benchmarks/bulk_ingest.py --backend qdrant --points 200000
+    python benchmarks/bulk_ingest.py --backend embedded --points 50000
+
+Run against a Qdrant server for meaningful numbers: local mode (QDRANT_PATH)
+never builds an HNSW index.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedded_store import EmbeddedStorage  # noqa: E402
+from vector_db import QdrantStorage, point_ids  # noqa: E402
+
+
+def make_storage(backend: str, dim: int, name: str, workdir: str):
+    if backend == "qdrant":
+        storage = QdrantStorage(dim=dim, collection_name=name)
+        return storage, lambda: storage.client.delete_collection(name)
+    if backend == "embedded":
+        return EmbeddedStorage(dim=dim, path=os.path.join(workdir, name), hnsw_threshold=10_000), lambda: None
+    raise ValueError(backend)
+
+
+def run(backend: str, bulk: bool, vectors: np.ndarray, batch: int, workdir: str):
+    name = f"bench_bulk_{'on' if bulk else 'off'}"
+    storage, cleanup = make_storage(backend, vectors.shape[1], name, workdir)
+    # Seed so searches have something to hit from the start
+    storage.upsert(point_ids("seed", batch), vectors[:batch], [{"source": "seed", "text": ""}] * batch)
+
+    latencies, done = [], threading.Event()
+
+    def query_load():
+        rng = np.random.default_rng(1)
+        while not done.is_set():
+            start = time.perf_counter()
+            storage.search(rng.standard_normal(vectors.shape[1], dtype=np.float32), top_k=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    searcher = threading.Thread(target=query_load)
+    searcher.start()
+    start = time.perf_counter()
+    try:
+        with storage.bulk_ingest() if bulk else nullcontext():
+            for offset in range(batch, len(vectors), batch):
+                count = min(batch, len(vectors) - offset)
+                storage.upsert(
+                    point_ids("bulk", count, start=offset),
+                    vectors[offset:offset + count],
+                    [{"source": "bulk", "text": ""}] * count,
+                    wait=not bulk
+                )
+        elapsed = time.perf_counter() - start  # includes waiting for the index to be rebuilt
+    finally:
+        done.set()
+        searcher.join()
+        cleanup()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else float("nan")
+    print(
+        f"{backend:8s} bulk={'on ' if bulk else 'off'} {len(vectors) / elapsed:10.0f} points/s  "
+        f"search during load p50={np.median(latencies):7.2f} ms  p95={p95:7.2f} ms  ({len(latencies)} searches)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["qdrant", "embedded"], default="qdrant")
+    parser.add_argument("--points", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--batch", type=int, default=1000, help="Points per upsert call")
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(0).standard_normal((args.points, args.dim), dtype=np.float32)
+    with tempfile.TemporaryDirectory() as workdir:
+        for bulk in (False, True):
+            run(args.backend, bulk, vectors, args.batch, workdir)
+
+
+if __name__ == "__main__":
+    main()
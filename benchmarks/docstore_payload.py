@@ -0,0 +1,111 @@
+"""
+Qdrant payload size and search cost with chunk texts in the payload vs in the docstore.
+
+Loads the same synthetic chunks (~1000 characters, like load_and_chunk_pdf) into two
+collections, one with DOCSTORE-style minimal payloads, and reports per point:
+payload bytes held by Qdrant, payload bytes returned per search, the docstore's
+compressed bytes on disk, and search latency including the text lookup.
+
+    python benchmarks/docstore_payload.py --points 5000
+    QDRANT_URL=http://localhost:6333 python benchmarks/docstore_payload.py --server --points 50000
+
+Without --server it runs Qdrant local mode in a temp directory.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docstore import ChunkStore  # noqa: E402
+from vector_db import QdrantStorage, point_ids  # noqa: E402
+
+WORDS = (
+    "retrieval augmented generation combines a retriever over a document corpus with a language "
+    "model that conditions its answer on the retrieved passages section figure table results"
+).split()
+
+
+def make_chunks(count: int, rng: np.random.Generator) -> list[str]:
+    chunks = []
+    for _ in range(count):
+        words, size = [], 0
+        while size < 1000:
+            word = WORDS[rng.integers(len(WORDS))]
+            words.append(word)
+            size += len(word) + 1
+        chunks.append(" ".join(words))
+    return chunks
+
+
+def payload_bytes(storage: QdrantStorage) -> int:
+    total, offset = 0, None
+    while True:
+        records, offset = storage.client.scroll(storage.collection_name, limit=1000, offset=offset, with_payload=True)
+        total += sum(len(json.dumps(r.payload)) for r in records)
+        if offset is None:
+            return total
+
+
+def bench(label: str, storage: QdrantStorage, vectors: np.ndarray, chunks: list[str],
+          queries: np.ndarray, top_k: int):
+    ids = point_ids("bench.pdf", len(chunks))
+    storage.upsert(ids, vectors, [{"source": "bench.pdf", "text": text} for text in chunks])
+
+    latencies, returned = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        storage.search(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits = storage.client.search(storage.collection_name, query_vector=query, limit=top_k,
+                                     with_payload=["source", "text"])
+        returned += sum(len(json.dumps(hit.payload)) for hit in hits)
+
+    stored = payload_bytes(storage) / len(chunks)
+    docstore = ""
+    if storage.docstore is not None:
+        on_disk = sum(f.stat().st_size for f in storage.docstore.path.parent.glob(storage.docstore.path.name + "*"))
+        docstore = f"  docstore={on_disk / len(chunks):6.0f} B/point on disk"
+    print(
+        f"{label:10s} qdrant payload={stored:6.0f} B/point  "
+        f"returned={returned / len(queries) / top_k:6.0f} B/hit  "
+        f"search p50={statistics.median(latencies):6.2f} ms{docstore}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--server", action="store_true", help="Use QDRANT_URL instead of local mode")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunks = make_chunks(args.points, rng)
+    vectors = rng.standard_normal((args.points, args.dim), dtype=np.float32)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if not args.server:
+            os.environ["QDRANT_PATH"] = os.path.join(workdir, "qdrant")
+        for label, docstore in (("payload", None), ("docstore", ChunkStore(os.path.join(workdir, "chunks.db")))):
+            name = f"bench_docstore_{label}"
+            storage = QdrantStorage(dim=args.dim, collection_name=name, docstore=docstore)
+            try:
+                bench(label, storage, vectors, chunks, queries, args.top_k)
+            finally:
+                storage.client.delete_collection(name)
+                storage.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Multi-process check of the embedded index (several uvicorn workers, one directory).
+
+Each process keeps its own tenant of fixed points and, in a loop, upserts into a
+scratch tenant, searches for one of its fixed points and deletes the scratch
+tenant again (a compaction that swaps the index files under the other
+processes). Every search must return the queried point first with its own text;
+afterwards a fresh instance must hold exactly the fixed points. Exits non-zero on
+any error or mismatch, and reports the operations each process completed.
+
+    python benchmarks/embedded_concurrency.py --processes 4 --seconds 5
+    python benchmarks/embedded_concurrency.py --hnsw-threshold 50   # with hnswlib
+"""
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+import time
+import traceback
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedded_store import EmbeddedStorage  # noqa: E402
+from vector_db import point_ids  # noqa: E402
+
+DIM = 64
+
+
+def vectors_for(tenant: str, count: int) -> np.ndarray:
+    rng = np.random.default_rng(zlib.crc32(tenant.encode("utf-8")))
+    return rng.standard_normal((count, DIM)).astype(np.float32)
+
+
+def worker(path: str, worker_id: int, points: int, seconds: float, hnsw_threshold: int, results):
+    try:
+        storage = EmbeddedStorage(dim=DIM, path=path, hnsw_threshold=hnsw_threshold)
+        tenant, scratch = f"fixed-{worker_id}", f"scratch-{worker_id}"
+        fixed = vectors_for(tenant, points)
+        storage.upsert(point_ids(tenant, points, tenant), fixed,
+                       [{"source": tenant, "text": f"{tenant}:{i}"} for i in range(points)], tenant_id=tenant)
+
+        ops, errors, i = 0, [], 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            i += 1
+            noise = vectors_for(f"{scratch}-{i}", 20)
+            storage.upsert(point_ids(f"{scratch}-{i}", 20, scratch), noise,
+                           [{"source": scratch, "text": "scratch"}] * 20, tenant_id=scratch)
+            row = i % points
+            found = storage.search(fixed[row], top_k=3, tenant_id=tenant)
+            if not found["contexts"] or found["contexts"][0] != f"{tenant}:{row}" or found["scores"][0] < 0.99:
+                errors.append(f"search for {tenant}:{row} returned {found['contexts'][:1]} {found['scores'][:1]}")
+            if i % 3 == 0:
+                storage.delete_tenant(scratch)
+            ops += 1
+        storage.delete_tenant(scratch)
+        results.put((worker_id, ops, errors))
+    except Exception:
+        results.put((worker_id, 0, [traceback.format_exc()]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--points", type=int, default=100, help="Fixed points per process")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--hnsw-threshold", type=int, default=10**12, help="Points above which search uses hnswlib")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        results = mp.Queue()
+        procs = [mp.Process(target=worker, args=(path, n, args.points, args.seconds, args.hnsw_threshold, results))
+                 for n in range(args.processes)]
+        for proc in procs:
+            proc.start()
+        outcomes = sorted(results.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+
+        failed = False
+        for worker_id, ops, errors in outcomes:
+            print(f"process {worker_id}: {ops} upsert/search/delete rounds, {len(errors)} errors")
+            for error in errors[:5]:
+                print("   ", error)
+            failed |= bool(errors)
+
+        storage = EmbeddedStorage(dim=DIM, path=path, hnsw_threshold=args.hnsw_threshold)
+        expected = args.processes * args.points
+        if storage.count() != expected:
+            print(f"fresh instance holds {storage.count()} points, expected {expected}")
+            failed = True
+        for worker_id in range(args.processes):
+            tenant = f"fixed-{worker_id}"
+            found = storage.search(vectors_for(tenant, args.points)[-1], top_k=1, tenant_id=tenant)
+            if found["contexts"] != [f"{tenant}:{args.points - 1}"]:
+                print(f"fresh instance: search for {tenant} returned {found['contexts']}")
+                failed = True
+
+    print("FAILED" if failed else "OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Query-embedding latency and ingest throughput per embedding backend.
+
+    python benchmarks/embedding_backends.py --backends openai local
+    python benchmarks/embedding_backends.py --backends local --queries 200 --chunks 2000
+
+Backends that cannot be created (missing API key or package) are skipped.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embeddings import create_embedding_provider  # noqa: E402
+
+QUESTION = "What are the main conclusions of the second chapter?"
+CHUNK = (
+    "Retrieval-augmented generation combines a retriever over a document corpus with a "
+    "language model that conditions its answer on the retrieved passages. "
+) * 8  # ~1000 characters, the size load_and_chunk_pdf produces
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def bench(backend: str, queries: int, chunks: int):
+    try:
+        provider = create_embedding_provider(backend)
+        provider.embed([QUESTION])  # warm up connections / model
+    except Exception as e:
+        print(f"{backend:8s} skipped: {e}")
+        return
+
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        provider.embed([f"{QUESTION} ({i})"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    texts = [f"{CHUNK} [{i}]" for i in range(chunks)]
+    start = time.perf_counter()
+    vectors = provider.embed(texts)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{backend:8s} dim={provider.dim:<5d} "
+        f"query p50={statistics.median(latencies):7.1f} ms  p95={percentile(latencies, 0.95):7.1f} ms  "
+        f"ingest={len(vectors) / elapsed:8.1f} chunks/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["openai", "local"])
+    parser.add_argument("--queries", type=int, default=50, help="Single-question embeds to time")
+    parser.add_argument("--chunks", type=int, default=500, help="Chunks to embed for throughput")
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        bench(backend, args.queries, args.chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold start benchmark for the API process.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and reports
+the total import time plus the slowest modules, then (optionally) starts
+uvicorn and measures how long it takes until /health answers.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --serve --budget-ms 1000
+
+Exits non-zero when a measurement exceeds --budget-ms, so it can run in CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure_imports(module: str = "main") -> tuple[float, list[tuple[int, int, str]]]:
+    """Return total import time (ms) and (self_us, cumulative_us, name) rows"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "STARTUP_WARMUP": "0"},
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+
+    total_ms = next(cum for _, cum, name in rows if name == module) / 1000
+    return total_ms, rows
+
+
+def measure_health(port: int = 8765, timeout: float = 30.0) -> float:
+    """Start uvicorn and return milliseconds until GET /health succeeds"""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "STARTUP_WARMUP": "0"},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        sys.exit(f"/health did not come up within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--serve", action="store_true", help="Also measure uvicorn start until /health answers")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a measurement exceeds this")
+    args = parser.parse_args()
+
+    total_ms, rows = measure_imports(args.module)
+    print(f"import {args.module}: {total_ms:.0f} ms")
+    print(f"\nTop {args.top} modules by cumulative time:")
+    for _, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    measurements = {"import": total_ms}
+    if args.serve:
+        measurements["health"] = measure_health()
+        print(f"\nuvicorn start -> /health: {measurements['health']:.0f} ms")
+
+    if args.budget_ms is not None:
+        over = {k: v for k, v in measurements.items() if v > args.budget_ms}
+        if over:
+            sys.exit(f"Over budget ({args.budget_ms:.0f} ms): {over}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput of the cross-process shared cache as worker processes are added.
+
+Each process plays one uvicorn worker serving cached /query answers and cached
+query embeddings from one SHARED_CACHE_PATH database (hot-key lookups, plus a
+write every `--write-every` lookups). Reports total and per-process ops/s for
+1, 2, 4, ... processes; near-constant per-process numbers mean linear scaling.
+
+    python benchmarks/shared_cache.py --processes 1 2 4 8 --seconds 3
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shared_cache import SharedCache, cache_key  # noqa: E402
+
+KEYS = 1000
+VECTOR = bytes(1536 * 4)
+
+
+def seed(path: str):
+    cache = SharedCache(path)
+    for i in range(KEYS):
+        cache.put_answer(cache_key("answer", i), {"answer": "x" * 500, "sources": ["a.pdf"], "scores": [0.5]})
+    cache.put_vectors({cache_key("embed", i): VECTOR for i in range(KEYS)})
+
+
+def worker(path: str, seconds: float, write_every: int, results):
+    cache = SharedCache(path)
+    ops, i = 0, os.getpid()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        i += 1
+        cache.get_answer(cache_key("answer", i % KEYS))
+        cache.get_vectors([cache_key("embed", i % KEYS)])
+        if write_every and i % write_every == 0:
+            cache.put_answer(cache_key("answer", i % KEYS), {"answer": "y" * 500})
+        ops += 1
+    results.put(ops)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--write-every", type=int, default=50, help="Lookups per answer write (0: read-only)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "shared_cache.db")
+        seed(path)
+        for count in args.processes:
+            results = mp.Queue()
+            procs = [mp.Process(target=worker, args=(path, args.seconds, args.write_every, results))
+                     for _ in range(count)]
+            for proc in procs:
+                proc.start()
+            total = sum(results.get() for _ in procs)
+            for proc in procs:
+                proc.join()
+            rate = total / args.seconds
+            print(f"{count:3d} processes  {rate:10.0f} lookups/s  {rate / count:9.0f} per process")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Search latency of the embedded index vs Qdrant local mode (no server).
+
+Loads the same random corpus into each backend and times single searches:
+    embedded-exact  EmbeddedStorage brute-force scan
+    embedded-hnsw   EmbeddedStorage with an hnswlib graph (needs hnswlib)
+    qdrant-local    QdrantStorage with QDRANT_PATH (qdrant_client local mode)
+
+    python benchmarks/vector_backends.py --points 5000 --queries 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedded_store import EmbeddedStorage  # noqa: E402
+from vector_db import QdrantStorage, point_ids  # noqa: E402
+
+
+def make_storage(backend: str, dim: int, workdir: str):
+    if backend == "embedded-exact":
+        return EmbeddedStorage(dim=dim, path=os.path.join(workdir, backend), hnsw_threshold=10**12)
+    if backend == "embedded-hnsw":
+        return EmbeddedStorage(dim=dim, path=os.path.join(workdir, backend), hnsw_threshold=1)
+    if backend == "qdrant-local":
+        os.environ["QDRANT_PATH"] = os.path.join(workdir, backend)
+        return QdrantStorage(dim=dim, collection_name="bench")
+    raise ValueError(backend)
+
+
+def bench(backend: str, vectors: np.ndarray, queries: np.ndarray, top_k: int, workdir: str):
+    try:
+        storage = make_storage(backend, vectors.shape[1], workdir)
+    except ImportError as e:
+        print(f"{backend:15s} skipped: {e}")
+        return
+
+    ids = point_ids("bench.pdf", len(vectors))
+    payloads = [{"source": "bench.pdf", "text": f"chunk {i}"} for i in range(len(vectors))]
+    start = time.perf_counter()
+    storage.upsert(ids, vectors, payloads)
+    load_s = time.perf_counter() - start
+
+    storage.search(queries[0], top_k)  # builds the HNSW graph if any
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        storage.search(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    print(
+        f"{backend:15s} load={load_s:6.2f} s  "
+        f"search p50={statistics.median(latencies):7.2f} ms  "
+        f"p95={latencies[int(len(latencies) * 0.95)]:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["embedded-exact", "embedded-hnsw", "qdrant-local"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.points, args.dim), dtype=np.float32)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    print(f"{args.points} points x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.backends:
+            bench(backend, vectors, queries, args.top_k, workdir)
+
+
+if __name__ == "__main__":
+    main()
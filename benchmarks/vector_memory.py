@@ -0,0 +1,57 @@
+"""
+Memory cost of holding embeddings as Python lists vs one float32 array.
+
+Decodes synthetic base64 embeddings (the wire format `embed_texts` requests)
+both ways and reports the peak traced allocation, without calling OpenAI.
+
+    python benchmarks/vector_memory.py --chunks 5000
+"""
+import argparse
+import base64
+import tracemalloc
+
+import numpy as np
+
+DIM = 1536
+
+
+def as_lists(encoded: list[str]) -> list[list[float]]:
+    return [np.frombuffer(base64.b64decode(e), dtype=np.float32).tolist() for e in encoded]
+
+
+def as_array(encoded: list[str]) -> np.ndarray:
+    vectors = np.empty((len(encoded), DIM), dtype=np.float32)
+    for i, e in enumerate(encoded):
+        vectors[i] = np.frombuffer(base64.b64decode(e), dtype=np.float32)
+    return vectors
+
+
+def peak_mb(fn, encoded: list[str]) -> float:
+    tracemalloc.start()
+    result = fn(encoded)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    encoded = [
+        base64.b64encode(rng.random(DIM, dtype=np.float32).tobytes()).decode()
+        for _ in range(args.chunks)
+    ]
+
+    lists_mb = peak_mb(as_lists, encoded)
+    array_mb = peak_mb(as_array, encoded)
+    print(f"{args.chunks} chunks x {DIM} dims")
+    print(f"  list[list[float]]: {lists_mb:8.1f} MB peak")
+    print(f"  float32 ndarray:   {array_mb:8.1f} MB peak ({lists_mb / array_mb:.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
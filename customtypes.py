@@ -1,24 +1,47 @@
 import pydantic
 
+MAX_TOP_K = 20  # most chunks a query may put into the prompt (the frontend slider's range)
+
 
 class RAGChunkANDSrc(pydantic.BaseModel):
     chunks: list[str]
     source_id: str = None 
+    tenant_id: str = "default"
+    start: int = 0  # index of the first chunk, for batches of a larger document
 
 
 
 class UpsertResult(pydantic.BaseModel):
     ingested: int 
+    batches: int = 1
+
+
+
+class IngestScheduled(pydantic.BaseModel):
+    scheduled: int  # chunks queued as rag/ingest_batch events, not yet embedded
+    batches: int
+    ranges: list[list[int]]  # [start, end) chunk range of each batch
 
 
 
 class RAGSearchResult(pydantic.BaseModel):
     contexts: list[str]
     sources: list[str]
+    scores: list[float] = []
 
 
 
 class RAGQuerySearchResult(pydantic.BaseModel):
     answer: str
     sources: list[str]
-    num_contexts: int
\ No newline at end of file
+    num_contexts: int
+    scores: list[float] = []
+
+
+class BatchQueryRequest(pydantic.BaseModel):
+    questions: list[str]
+    top_k: int = pydantic.Field(5, ge=1, le=MAX_TOP_K)
+    source_filter: str | None = None
+    adaptive: bool = False
+    min_k: int = pydantic.Field(1, ge=1, le=MAX_TOP_K)
+    max_k: int = pydantic.Field(10, ge=1, le=MAX_TOP_K)
@@ -1,20 +1,45 @@
-import fitz  # PyMuPDF
-from openai import OpenAI
 from dotenv import load_dotenv
-from typing import List
+from functools import lru_cache
+from typing import List, Optional, TYPE_CHECKING
 import os
 
-load_dotenv()
+if TYPE_CHECKING:
+    import numpy as np
 
-# Get API key explicitly
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+load_dotenv()
 
-# Initialize OpenAI client with explicit API key
-client = OpenAI(api_key=OPENAI_API_KEY)
 EMBED_MODEL = "text-embedding-3-small"
 EMBED_DIM = 1536  # text-embedding-3-small dimension
+EMBED_BATCH_SIZE = 512  # inputs per embeddings request (API limit is 2048)
+
+
+@lru_cache(maxsize=1)
+def get_openai_client():
+    """
+    Shared OpenAI client, created on first use.
+    
+    Building it lazily keeps `openai` off the API's import path (faster cold
+    starts) and reuses one connection pool across requests.
+    """
+    from openai import OpenAI
+
+    # Get API key explicitly
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return OpenAI(api_key=api_key)
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client():
+    """Shared AsyncOpenAI client, for running many completions concurrently"""
+    from openai import AsyncOpenAI
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return AsyncOpenAI(api_key=api_key)
+
 
 def load_and_chunk_pdf(path: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> List[str]:
     """
@@ -28,6 +53,8 @@ def load_and_chunk_pdf(path: str, chunk_size: int = 1000, chunk_overlap: int = 1
     Returns:
         List of text chunks
     """
+    import fitz  # PyMuPDF
+
     # Open PDF
     doc = fitz.open(path)
     texts = []
@@ -73,22 +100,42 @@ def load_and_chunk_pdf(path: str, chunk_size: int = 1000, chunk_overlap: int = 1
     return chunks
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def embed_texts(texts: List[str], timeout: Optional[float] = None) -> "np.ndarray":
     """
-    Generate embeddings for a list of texts using OpenAI.
+    Generate embeddings for a list of texts with the configured provider.
+    
+    Uses OpenAI by default; EMBED_BACKEND=local embeds on CPU instead
+    (see embeddings.py). With SHARED_CACHE_PATH set, vectors are cached
+    across worker processes (see shared_cache.py).
     
     Args:
         texts: List of text strings to embed
+        timeout: Seconds allowed per embeddings request (None for the client default)
     
     Returns:
-        List of embedding vectors
+        Contiguous float32 array of shape (len(texts), provider dimension)
     """
-    if not texts:
-        return []
-    
-    response = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=texts
-    )
-    
-    return [item.embedding for item in response.data]
+    import numpy as np
+    from embeddings import get_embedding_provider
+    from shared_cache import get_shared_cache, cache_key
+
+    provider = get_embedding_provider()
+    cache = get_shared_cache()
+    if cache is None:
+        return provider.embed(texts, timeout=timeout)
+
+    # Shared across worker processes: each distinct text is embedded once per box
+    keys = [cache_key(provider.name, provider.model_name, provider.dim, text) for text in texts]
+    cached = cache.get_vectors(keys)
+    missing = list(dict.fromkeys(key for key in keys if key not in cached))
+    if missing:
+        text_of = dict(zip(keys, texts))
+        fresh = provider.embed([text_of[key] for key in missing], timeout=timeout)
+        new = {key: fresh[i].tobytes() for i, key in enumerate(missing)}
+        cache.put_vectors(new)
+        cached.update(new)
+
+    vectors = np.empty((len(texts), provider.dim), dtype=np.float32)
+    for i, key in enumerate(keys):
+        vectors[i] = np.frombuffer(cached[key], dtype=np.float32)
+    return vectors
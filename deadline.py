@@ -0,0 +1,97 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class DeadlineExceeded(TimeoutError):
+    """A request ran out of time before (or while) running one of its stages"""
+
+
+class Deadline:
+    """Absolute point in time a request must finish by, shared by all of its stages"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, stage: str) -> float:
+        """Time left for `stage`; raises DeadlineExceeded if there is none"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded at {stage}")
+        return remaining
+
+
+def time_left(deadline: Deadline | None, stage: str) -> float | None:
+    """Per-call timeout for `stage`, or None (client default) without a deadline"""
+    return deadline.timeout(stage) if deadline is not None else None
+
+
+def time_left_seconds(deadline: Deadline | None, stage: str) -> int | None:
+    """
+    Like `time_left`, in whole seconds for APIs that only take ints: rounded down so the
+    call can't outlive the deadline, but at least 1 so the call still gets a chance
+    """
+    timeout = time_left(deadline, stage)
+    return max(1, math.floor(timeout)) if timeout is not None else None
+
+
+class LatencyTracker:
+    """Recent latencies of one kind of call, for picking a hedge delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        """p-th percentile (0-1) of the window, or None until min_samples are recorded"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def hedged(call, hedge_after: float | None = None, deadline: Deadline | None = None,
+                 stage: str = "the call"):
+    """
+    Await `call()`; if it is still running after `hedge_after` seconds, start a second
+    identical call and return whichever succeeds first, cancelling the other.
+
+    The whole thing is bounded by `deadline` (DeadlineExceeded). A failure of one
+    attempt only propagates once no other attempt is left running.
+    """
+    tasks = {asyncio.create_task(call())}
+    hedge_pending = hedge_after is not None
+    error = None
+    try:
+        while tasks:
+            wait = time_left(deadline, stage)
+            if hedge_pending:
+                wait = hedge_after if wait is None else min(wait, hedge_after)
+            done, tasks = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+
+            if hedge_pending and not done:
+                hedge_pending = False
+                tasks.add(asyncio.create_task(call()))
+            elif not done:
+                time_left(deadline, stage)  # raises once the deadline has passed
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
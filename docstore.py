@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+SQLITE_MAX_PARAMS = 900  # stay under SQLite's bound-parameter limit per statement
+COMPRESSION_LEVEL = 6
+
+
+class ChunkStore:
+    """
+    Chunk texts keyed by point id, in a local SQLite file (DOCSTORE_PATH).
+
+    With a docstore, Qdrant payloads keep only the small filter fields (source,
+    tenant) and searches fetch the texts of their hits here in one lookup. Texts
+    are zlib-compressed. WAL mode lets several worker processes share the file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id TEXT PRIMARY KEY, tenant_id TEXT NOT NULL, text BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_tenant ON chunks (tenant_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, ids: list[str], texts: list[str], tenant_id: str):
+        rows = [
+            (str(point_id), tenant_id, zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL))
+            for point_id, text in zip(ids, texts)
+        ]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO chunks (id, tenant_id, text) VALUES (?, ?, ?)", rows)
+
+    def get_many(self, ids: list[str]) -> dict[str, str]:
+        """Texts of the given point ids; ids without a stored text are left out"""
+        ids = list(dict.fromkeys(str(point_id) for point_id in ids))
+        conn = self._connect()
+        texts = {}
+        for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+            batch = ids[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            for point_id, blob in conn.execute(f"SELECT id, text FROM chunks WHERE id IN ({placeholders})", batch):
+                texts[point_id] = zlib.decompress(blob).decode("utf-8")
+        return texts
+
+    def delete_tenant(self, tenant_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE tenant_id = ?", (tenant_id,))
+
+
+def get_docstore() -> ChunkStore | None:
+    """Docstore configured by DOCSTORE_PATH, or None to keep texts in the vector payloads"""
+    path = os.getenv("DOCSTORE_PATH")
+    return ChunkStore(path) if path else None
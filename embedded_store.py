@@ -0,0 +1,379 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from vector_db import VectorStorage, DEFAULT_TENANT, TENANT_FIELD
+
+HNSW_THRESHOLD = 20_000  # below this many points exact search is fast enough
+HNSW_OVERSAMPLE = 4  # fetch top_k * this from the graph, then apply the tenant filter
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _hnswlib():
+    try:
+        import hnswlib
+        return hnswlib
+    except ImportError:
+        return None
+
+
+def _log_rows(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+class EmbeddedStorage(VectorStorage):
+    """
+    In-process vector index for small and edge deployments - no Qdrant server.
+
+    Persisted to a directory (EMBEDDED_INDEX_PATH) as append-only files:
+        vectors.f32   raw unit-normalized float32 rows, memory-mapped
+        points.jsonl  one {"row", "id", "payload"} line per write; a later line
+                      for a row replaces the earlier one
+        meta.json     vector dimension, and a generation bumped by every compaction
+        hnsw.bin      hnswlib graph, only for corpora of EMBEDDED_HNSW_THRESHOLD+
+                      points, with hnsw.json recording how much of the log it covers
+
+    Writes append new rows (or overwrite an existing id's row in place) under an
+    inter-process file lock, so several worker processes can share one index.
+    Each process reads the log lines the others appended before it searches or
+    writes. delete_tenant compacts the files. Search is an exact cosine scan
+    (one matrix-vector product) unless the corpus is above the threshold and
+    hnswlib is installed.
+    """
+
+    def __init__(self, dim: int = 1536, path: str | None = None, hnsw_threshold: int | None = None):
+        self.dim = dim
+        self.path = Path(path or os.getenv("EMBEDDED_INDEX_PATH", "data/embedded_index"))
+        self.hnsw_threshold = hnsw_threshold or int(os.getenv("EMBEDDED_HNSW_THRESHOLD", HNSW_THRESHOLD))
+        self._lock = threading.RLock()
+        self._bulk_depth = 0
+        self._reset()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._file_lock():
+            self._migrate_legacy()
+            self._check_meta()
+        with self._lock, self._file_lock(shared=True):
+            self._refresh(locked=True)
+            self._load_graph()
+
+    # -- files -------------------------------------------------------------
+
+    @property
+    def _log_file(self) -> Path:
+        return self.path / "points.jsonl"
+
+    @property
+    def _vectors_file(self) -> Path:
+        return self.path / "vectors.f32"
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """Inter-process lock: exclusive for writes, shared for full reloads"""
+        with open(self.path / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _migrate_legacy(self):
+        """Convert an index written as whole-file vectors.npy + points.json"""
+        legacy = self.path / "points.json"
+        if not legacy.exists() or self._log_file.exists():
+            return
+        points = json.loads(legacy.read_text())
+        vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        (self.path / "meta.json").write_text(json.dumps({"dim": vectors.shape[1]}))
+        with open(self._vectors_file, "wb") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self._log_file, "wb") as f:
+            for row, (point_id, payload) in enumerate(zip(points["ids"], points["payloads"])):
+                f.write(json.dumps({"row": row, "id": point_id, "payload": payload}).encode("utf-8") + b"\n")
+        for name in ("points.json", "vectors.npy", "hnsw.bin"):
+            (self.path / name).unlink(missing_ok=True)
+
+    def _generation(self) -> int:
+        """Compaction count; tells a rewritten log apart even if it reuses the old inode"""
+        try:
+            return json.loads((self.path / "meta.json").read_text()).get("generation", 0)
+        except FileNotFoundError:
+            return 0
+
+    def _check_meta(self):
+        meta_file = self.path / "meta.json"
+        if not meta_file.exists():
+            meta_file.write_text(json.dumps({"dim": self.dim}))
+            return
+        stored_dim = json.loads(meta_file.read_text())["dim"]
+        if stored_dim != self.dim:
+            raise ValueError(
+                f"Embedded index at {self.path} holds {stored_dim}-dim vectors but the embedding "
+                f"backend produces {self.dim}-dim vectors; set EMBEDDED_INDEX_PATH to a separate directory"
+            )
+
+    # -- in-memory state ---------------------------------------------------
+
+    def _reset(self):
+        self._ids, self._payloads, self._rows = [], [], {}
+        self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        self._log_offset = 0  # bytes of points.jsonl applied so far
+        self._log_generation = None
+        self._log_stat = None  # (inode, size, mtime) of points.jsonl when last read
+        self._filters = None
+        self._hnsw = None
+
+    def _refresh(self, locked: bool = False):
+        """Catch up with lines appended to the log (by any process) since the last call"""
+        if not locked:
+            try:
+                stat = self._log_file.stat()
+                if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == self._log_stat:
+                    return  # nothing appended or compacted since the last read
+            except FileNotFoundError:
+                pass
+            # Read under a shared lock so no writer appends and no compaction swaps
+            # the files between reading the log and mapping the vectors
+            with self._file_lock(shared=True):
+                return self._refresh(locked=True)
+
+        generation = self._generation()
+        try:
+            log = open(self._log_file, "rb")
+        except FileNotFoundError:
+            if self._ids:
+                self._reset()
+            return
+        with log:
+            stat = os.fstat(log.fileno())
+            if generation != self._log_generation:
+                self._reset()  # compacted (or first load): read everything
+                self._log_generation = generation
+            self._log_stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if stat.st_size <= self._log_offset:
+                return
+            log.seek(self._log_offset)
+            data = log.read(stat.st_size - self._log_offset)
+        self._log_offset += len(data)
+
+        changed = self._apply(_log_rows(data))
+        rows = len(self._ids)
+        with open(self._vectors_file, "rb") as f:
+            if rows * self.dim * 4 > os.fstat(f.fileno()).st_size:
+                raise ValueError(f"Embedded index at {self.path} is inconsistent: {rows} points, fewer vectors")
+            # mmap: nothing is read or copied until a search touches the pages
+            self._vectors = np.memmap(f, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+        if self._hnsw is not None:
+            if self._bulk_depth:
+                self._hnsw = None  # rebuilt once when the bulk load ends
+            else:
+                # hnswlib updates existing labels in place and appends new ones
+                self._hnsw.resize_index(rows)
+                self._hnsw.add_items(self._vectors[changed], np.array(changed))
+
+    def _apply(self, records: list[dict]) -> list[int]:
+        for record in records:
+            row = record["row"]
+            if row == len(self._ids):
+                self._ids.append(record["id"])
+                self._payloads.append(record["payload"])
+                self._rows[record["id"]] = row
+            else:
+                self._payloads[row] = record["payload"]
+        self._filters = None
+        return sorted({record["row"] for record in records})
+
+    def _tenant_and_source(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._filters is None:
+            self._filters = (
+                np.array([p.get(TENANT_FIELD, DEFAULT_TENANT) for p in self._payloads], dtype=object),
+                np.array([p.get("source") for p in self._payloads], dtype=object),
+            )
+        return self._filters
+
+    # -- HNSW --------------------------------------------------------------
+
+    def _load_graph(self):
+        hnswlib = _hnswlib()
+        hnsw_file, meta_file = self.path / "hnsw.bin", self.path / "hnsw.json"
+        if not (hnswlib and hnsw_file.exists() and meta_file.exists()) or len(self._ids) < self.hnsw_threshold:
+            return
+        meta = json.loads(meta_file.read_text())
+        if meta.get("generation") != self._log_generation or meta["offset"] > self._log_offset:
+            return  # saved before a compaction; rebuilt on demand
+
+        index = hnswlib.Index(space="cosine", dim=self.dim)
+        index.load_index(str(hnsw_file), max_elements=len(self._ids))
+        with open(self._log_file, "rb") as f:
+            f.seek(meta["offset"])
+            later = _log_rows(f.read(self._log_offset - meta["offset"]))
+        changed = sorted({record["row"] for record in later})
+        if changed:
+            index.add_items(self._vectors[changed], np.array(changed))
+        index.set_ef(128)
+        self._hnsw = index
+
+    def _graph(self):
+        """HNSW graph for large corpora, built on first use; None means exact search"""
+        if self._bulk_depth or self._hnsw is not None or len(self._ids) < self.hnsw_threshold:
+            return self._hnsw
+        hnswlib = _hnswlib()
+        if hnswlib is None:
+            return None
+
+        index = hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(max_elements=len(self._ids), ef_construction=200, M=16)
+        index.add_items(self._vectors, np.arange(len(self._ids)))
+        index.set_ef(128)
+        self._hnsw = index
+
+        # Saved with the log position it covers; other processes replay the rest.
+        # Both files are written under the exclusive lock so another process can't
+        # pair its graph with this one's offset, and not at all after a compaction.
+        with self._file_lock():
+            if self._generation() == self._log_generation:
+                tmp = self.path / f"hnsw.bin.{os.getpid()}.tmp"
+                index.save_index(str(tmp))
+                os.replace(tmp, self.path / "hnsw.bin")
+                (self.path / "hnsw.json").write_text(json.dumps({"generation": self._log_generation, "offset": self._log_offset}))
+        return index
+
+    # -- VectorStorage -----------------------------------------------------
+
+    def upsert(self, ids: list[str], vectors: np.ndarray, payloads: list[dict],
+               tenant_id: str = DEFAULT_TENANT, wait: bool = True):
+        vectors = _normalize(vectors)
+        latest = {}  # the last occurrence of an id within the batch wins
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            latest[point_id] = (vector, {**payload, TENANT_FIELD: tenant_id})
+
+        with self._lock, self._file_lock():
+            self._refresh(locked=True)
+            count = len(self._ids)
+            records, new_vectors = [], []
+            with open(self._vectors_file, "r+b" if self._vectors_file.exists() else "w+b") as f:
+                for point_id, (vector, payload) in latest.items():
+                    row = self._rows.get(point_id)
+                    if row is None:
+                        row = count + len(new_vectors)
+                        new_vectors.append(vector)
+                    else:
+                        f.seek(row * self.dim * 4)
+                        f.write(vector.tobytes())
+                    records.append({"row": row, "id": point_id, "payload": payload})
+                if new_vectors:
+                    # Only the new rows are written; the file is never rewritten whole
+                    f.seek(count * self.dim * 4)
+                    f.write(np.stack(new_vectors).tobytes())
+                    f.truncate()
+
+            # Vectors first, then the log lines that make them visible, in one write
+            with open(self._log_file, "ab") as f:
+                f.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+            self._refresh(locked=True)
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5,
+               tenant_id: str = DEFAULT_TENANT, source: str | None = None,
+               timeout: int | None = None) -> dict:
+        query = _normalize(query_vector)
+        with self._lock:
+            self._refresh()
+            vectors, payloads, graph = self._vectors, self._payloads, self._graph()
+            tenants, sources = self._tenant_and_source()
+            mask = tenants == tenant_id
+            if source:
+                mask &= sources == source
+
+        rows, scores = None, None
+        if graph is not None:
+            labels, distances = graph.knn_query(query, k=min(len(payloads), top_k * HNSW_OVERSAMPLE))
+            keep = mask[labels[0]]
+            rows, scores = labels[0][keep][:top_k], 1 - distances[0][keep][:top_k]
+            if len(rows) < min(top_k, int(mask.sum())):
+                rows = None  # tenant too sparse in the graph's neighbourhood - scan exactly
+
+        if rows is None:
+            all_scores = vectors @ query if len(payloads) else np.empty(0, dtype=np.float32)
+            all_scores = np.where(mask, all_scores, -np.inf)
+            k = min(top_k, int(mask.sum()))
+            rows = np.argpartition(-all_scores, k - 1)[:k] if 0 < k < len(all_scores) else np.flatnonzero(mask)
+            rows = rows[np.argsort(-all_scores[rows])][:k]
+            scores = all_scores[rows]
+
+        return {
+            "contexts": [payloads[row]["text"] for row in rows],
+            "sources": [payloads[row]["source"] for row in rows],
+            "scores": [float(score) for score in scores],
+        }
+
+    def count(self, tenant_id: str | None = None) -> int:
+        with self._lock:
+            self._refresh()
+            if tenant_id is None:
+                return len(self._ids)
+            return int((self._tenant_and_source()[0] == tenant_id).sum())
+
+    def iter_points(self, tenant_id: str | None = None, batch_size: int = 1000):
+        with self._lock:
+            self._refresh()
+            vectors, ids, payloads = self._vectors, self._ids, self._payloads
+            tenants = self._tenant_and_source()[0]
+            rows = np.arange(len(ids)) if tenant_id is None else np.flatnonzero(tenants == tenant_id)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            yield [ids[row] for row in batch], np.asarray(vectors[batch]), [payloads[row] for row in batch]
+
+    @contextmanager
+    def bulk_ingest(self):
+        """Skip graph updates per upsert; rebuild the graph once at the end"""
+        with self._lock:
+            self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._bulk_depth -= 1
+                if self._bulk_depth == 0:
+                    self._graph()
+
+    def delete_tenant(self, tenant_id: str = DEFAULT_TENANT):
+        with self._lock, self._file_lock():
+            self._refresh(locked=True)
+            keep = np.flatnonzero(self._tenant_and_source()[0] != tenant_id)
+
+            # Compact into new files and swap them in; other processes see the new
+            # generation and reload. The graph is rebuilt on demand without the points.
+            tmp = self.path / "vectors.f32.tmp"
+            with open(tmp, "wb") as f:
+                for start in range(0, len(keep), 10_000):
+                    f.write(np.ascontiguousarray(self._vectors[keep[start:start + 10_000]]).tobytes())
+            os.replace(tmp, self._vectors_file)
+
+            tmp = self.path / "points.jsonl.tmp"
+            with open(tmp, "wb") as f:
+                for new_row, row in enumerate(keep):
+                    record = {"row": new_row, "id": self._ids[row], "payload": self._payloads[row]}
+                    f.write(json.dumps(record).encode("utf-8") + b"\n")
+            os.replace(tmp, self._log_file)
+
+            meta = json.loads((self.path / "meta.json").read_text())
+            meta["generation"] = meta.get("generation", 0) + 1
+            tmp = self.path / "meta.json.tmp"
+            tmp.write_text(json.dumps(meta))
+            os.replace(tmp, self.path / "meta.json")
+
+            for name in ("hnsw.bin", "hnsw.json"):
+                (self.path / name).unlink(missing_ok=True)
+            self._reset()
+            self._refresh(locked=True)
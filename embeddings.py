@@ -0,0 +1,144 @@
+"""
+Embedding providers behind `data_loader.embed_texts`.
+
+EMBED_BACKEND picks the provider:
+    openai  - OpenAI embeddings API (default)
+    local   - sentence-transformers model on CPU, no network hop
+              (pip install sentence-transformers)
+
+Every provider returns a contiguous float32 array of shape (len(texts), dim).
+Vectors from different providers are not comparable, so each backend needs its
+own collection (see QDRANT_COLLECTION); the storage layer refuses to mix them.
+"""
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from data_loader import get_openai_client, EMBED_MODEL, EMBED_DIM, EMBED_BATCH_SIZE
+
+if TYPE_CHECKING:
+    import numpy as np
+
+LOCAL_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_EMBED_BATCH_SIZE = 64
+
+
+class EmbeddingProvider:
+    """Turns texts into float32 vectors of a fixed dimension"""
+
+    name: str
+    model_name: str
+    dim: int
+
+    def embed(self, texts: list[str], timeout: float | None = None) -> "np.ndarray":
+        """Embed texts; `timeout` bounds network calls (local providers ignore it)"""
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = "openai"
+
+    def __init__(self, model: str = EMBED_MODEL, dim: int = EMBED_DIM):
+        self.model = model
+        self.model_name = model
+        self.dim = dim
+
+    def embed(self, texts: list[str], timeout: float | None = None) -> "np.ndarray":
+        # Requested base64-encoded and decoded straight into one contiguous float32
+        # array, instead of one boxed Python float per dimension
+        import numpy as np
+
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        client = get_openai_client()
+        if timeout is not None:
+            # A retry would start after the deadline, so fail fast instead
+            client = client.with_options(timeout=timeout, max_retries=0)
+
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            response = client.embeddings.create(
+                model=self.model,
+                input=texts[start:start + EMBED_BATCH_SIZE],
+                encoding_format="base64"
+            )
+            for item in response.data:
+                vectors[start + item.index] = np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+
+        return vectors
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    sentence-transformers model running on CPU.
+
+    Short inputs (a query) are encoded inline; larger inputs are split into
+    batches that are encoded on a small thread pool (the model releases the GIL
+    during inference). LOCAL_EMBED_RUNTIME=onnx/openvino selects an optimized
+    runtime when the installed sentence-transformers supports it.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name: str = LOCAL_EMBED_MODEL, batch_size: int = LOCAL_EMBED_BATCH_SIZE,
+                 workers: int | None = None, runtime: str = "torch"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError(
+                "EMBED_BACKEND=local requires sentence-transformers: pip install sentence-transformers"
+            ) from None
+
+        kwargs = {"device": "cpu"}
+        if runtime != "torch":
+            kwargs["backend"] = runtime
+        self.model = SentenceTransformer(model_name, **kwargs)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed")
+        self.dim = self._encode(["dimension probe"]).shape[1]
+
+    def _encode(self, texts: list[str]) -> "np.ndarray":
+        import numpy as np
+
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def embed(self, texts: list[str], timeout: float | None = None) -> "np.ndarray":
+        import numpy as np
+
+        if len(texts) <= self.batch_size:
+            return self._encode(texts) if texts else np.empty((0, self.dim), dtype=np.float32)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, batch_vectors in enumerate(self._pool.map(self._encode, batches)):
+            start = i * self.batch_size
+            vectors[start:start + len(batch_vectors)] = batch_vectors
+        return vectors
+
+
+def create_embedding_provider(backend: str) -> EmbeddingProvider:
+    if backend == "openai":
+        return OpenAIEmbeddingProvider()
+    if backend == "local":
+        return LocalEmbeddingProvider(
+            model_name=os.getenv("LOCAL_EMBED_MODEL", LOCAL_EMBED_MODEL),
+            batch_size=int(os.getenv("LOCAL_EMBED_BATCH_SIZE", LOCAL_EMBED_BATCH_SIZE)),
+            workers=int(os.getenv("LOCAL_EMBED_WORKERS", 0)) or None,
+            runtime=os.getenv("LOCAL_EMBED_RUNTIME", "torch")
+        )
+    raise ValueError(f"Unknown EMBED_BACKEND '{backend}' (expected 'openai' or 'local')")
+
+
+@lru_cache(maxsize=1)
+def get_embedding_provider() -> EmbeddingProvider:
+    """Process-wide provider selected by EMBED_BACKEND"""
+    return create_embedding_provider(os.getenv("EMBED_BACKEND", "openai"))
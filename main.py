@@ -1,22 +1,155 @@
+import asyncio
+import json
+import hashlib
 import logging
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Depends, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 import inngest
 import inngest.fast_api
 from dotenv import load_dotenv
-import uuid
 import os
 import datetime
 import base64
+import re
 import tempfile
-from openai import OpenAI
-from data_loader import load_and_chunk_pdf, embed_texts
-from vector_db import QdrantStorage
-from customtypes import RAGChunkANDSrc, UpsertResult, RAGSearchResult, RAGQuerySearchResult
-from qdrant_client.models import VectorParams, Distance
+import time
+from data_loader import load_and_chunk_pdf, embed_texts, get_openai_client, get_async_openai_client
+from vector_db import get_storage, select_adaptive, DEFAULT_TENANT, point_ids
+from admission import AdmissionController, client_id
+import profiling
+from deadline import Deadline, DeadlineExceeded, LatencyTracker, hedged, time_left, time_left_seconds
+from shared_cache import get_shared_cache, cache_key
+from customtypes import MAX_TOP_K, RAGChunkANDSrc, UpsertResult, IngestScheduled, RAGSearchResult, RAGQuerySearchResult, BatchQueryRequest
 
 load_dotenv()
 
+ANSWER_MODEL = "gpt-4o-mini"
+# Fixed instructions, sent first; the retrieved context follows and the question comes
+# last. OpenAI only caches prompt prefixes of 1024+ tokens, so this ~40-token prompt on
+# its own yields no cached tokens: only requests that retrieve the same context block
+# (e.g. follow-up questions on one document) can share a cacheable prefix
+SYSTEM_PROMPT = (
+    "You answer questions using only the provided context. "
+    "The user message lists the context, then the question. "
+    "Answer concisely using that context."
+)
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in the uploaded documents. Please upload documents first."
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", 1000))
+BATCH_COMPLETION_CONCURRENCY = int(os.getenv("BATCH_COMPLETION_CONCURRENCY", 8))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))  # chunks per rag/ingest_batch event
+INGEST_SOURCE_CONCURRENCY = int(os.getenv("INGEST_SOURCE_CONCURRENCY", 4))
+INGEST_GLOBAL_CONCURRENCY = int(os.getenv("INGEST_GLOBAL_CONCURRENCY", 10))
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", 50))  # seconds; below the frontend's 60s
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 0))  # e.g. 0.95; 0 disables hedging
+
+completion_latency = LatencyTracker()
+
+
+def _search_documents(question: str, top_k: int, tenant_id: str, source: str | None,
+                      deadline: Deadline | None = None) -> dict:
+    query_vec = embed_texts([question], timeout=time_left(deadline, "embedding"))[0]
+    return get_storage().search(
+        query_vec, top_k=top_k, tenant_id=tenant_id, source=source,
+        timeout=time_left_seconds(deadline, "search")
+    )
+
+
+def _search_documents_batch(questions: list[str], top_k: int, tenant_id: str, source: str | None) -> list[dict]:
+    """One embeddings call and one batched search for all questions"""
+    query_vecs = embed_texts(questions)
+    return get_storage().search_batch(query_vecs, top_k=top_k, tenant_id=tenant_id, source=source)
+
+
+def _clamp_k(value) -> int:
+    """Chunk count from an event, limited like the API's top_k/min_k/max_k"""
+    return min(max(int(value), 1), MAX_TOP_K)
+
+
+def _invalidate_answers(tenant_id: str):
+    """Drop the tenant's cached answers (in every worker) after its documents change"""
+    cache = get_shared_cache()
+    if cache is not None:
+        cache.bump_generation(tenant_id)
+
+
+def _build_messages(contexts: list[str], question: str) -> list[dict]:
+    context_block = "\n\n".join(f"- {c}" for c in contexts)
+    user_content = f"Context:\n{context_block}\n\nQuestion: {question}"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_content}
+    ]
+
+
+async def _generate_answer(contexts: list[str], question: str, deadline: Deadline | None = None,
+                           hedge: bool = False) -> str:
+    """
+    Completion for the question, bounded by `deadline`.
+
+    With `hedge` and HEDGE_PERCENTILE set, a second identical request is sent once
+    the first has run longer than that percentile of recent completions.
+    """
+    client = get_async_openai_client()
+    messages = _build_messages(contexts, question)
+
+    async def _complete() -> str:
+        started = time.monotonic()
+        response = await client.chat.completions.create(
+            model=ANSWER_MODEL,
+            max_tokens=1024,
+            temperature=0.2,
+            messages=messages,
+            timeout=time_left(deadline, "answer generation")
+        )
+        completion_latency.record(time.monotonic() - started)
+        return response.choices[0].message.content.strip()
+
+    hedge_after = completion_latency.percentile(HEDGE_PERCENTILE) if hedge and HEDGE_PERCENTILE else None
+    return await hedged(_complete, hedge_after, deadline, stage="answer generation")
+
+
+async def _answer(question: str, found: dict, deadline: Deadline | None = None, hedge: bool = False) -> dict:
+    """Answer one question from its search result, in the /query response shape"""
+    if not found.get("contexts"):
+        answer = NO_CONTEXT_ANSWER
+    else:
+        answer = await _generate_answer(found["contexts"], question, deadline, hedge)
+    return {
+        "status": "completed",
+        "answer": answer,
+        "sources": found["sources"],
+        "scores": found["scores"],
+        "num_contexts": len(found["contexts"])
+    }
+
+
+async def _answer_batch(questions: list[str], found_list: list[dict]):
+    """Yield (index, result) as each answer finishes, with bounded concurrency"""
+    semaphore = asyncio.Semaphore(BATCH_COMPLETION_CONCURRENCY)
+
+    async def _one(index: int) -> tuple[int, dict]:
+        async with semaphore:
+            try:
+                return index, await _answer(questions[index], found_list[index])
+            except Exception as e:
+                return index, {"status": "error", "message": str(e)}
+
+    pending = {asyncio.create_task(_one(i)) for i in range(len(questions))}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Client went away or the consumer stopped early - don't keep calling OpenAI
+        for task in pending:
+            task.cancel()
+
+
 # Configure Inngest for production
 inngest_client = inngest.Inngest(
     app_id='rag_app',
@@ -29,21 +162,21 @@ inngest_client = inngest.Inngest(
 @inngest_client.create_function(
     fn_id='RAG: ingest PDF',
     trigger=inngest.TriggerEvent(event='rag/ingest_pdf'),
-    throttle=inngest.Throttle(
-        count=2,
-        period=datetime.timedelta(minutes=1)
-    ),
+    # One chunking run per document at a time; different documents (or the same file
+    # name in different tenants) proceed in parallel
+    concurrency=[inngest.Concurrency(limit=1, key="event.data.tenant_id + ':' + event.data.source_id")],
     rate_limit=inngest.RateLimit(
         limit=1,
         period=datetime.timedelta(hours=4),
-        key="event.data.source_id"
+        key="event.data.tenant_id + ':' + event.data.source_id"
     )
 )
 async def rag_ingest_pdf(ctx, step):
-    def _load() -> dict:
+    async def _chunk_and_fan_out() -> dict:
         # Get PDF content from event (base64 encoded)
         pdf_content = ctx.event.data.get("pdf_content")
         source_id = ctx.event.data.get("source_id")
+        tenant_id = ctx.event.data.get("tenant_id", DEFAULT_TENANT)
         
         # Decode base64 and save to temporary file
         pdf_bytes = base64.b64decode(pdf_content)
@@ -54,25 +187,62 @@ async def rag_ingest_pdf(ctx, step):
             tmp_path = tmp.name
         
         try:
-            chunks = load_and_chunk_pdf(tmp_path)
-            return RAGChunkANDSrc(chunks=chunks, source_id=source_id).model_dump()
+            chunks = await run_in_threadpool(load_and_chunk_pdf, tmp_path)
         finally:
             # Clean up temp file
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
-    
-    def _upsert(chunks_and_src: dict) -> dict:
-        chunks = chunks_and_src["chunks"]
-        source_id = chunks_and_src["source_id"]
-        vecs = embed_texts(chunks)
-        ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, name=f"{source_id}:{i}")) for i in range(len(chunks))]
-        payloads = [{"source": source_id, "text": chunks[i]} for i in range(len(chunks))]
-        QdrantStorage().upsert(ids, vecs, payloads)
-        return UpsertResult(ingested=len(chunks)).model_dump()
 
-    chunks_and_src = await step.run('load_and_chunk', _load)
-    ingested = await step.run("embed_and_upsert", lambda: _upsert(chunks_and_src))
-    return ingested
+        # Fan out: one rag/ingest_batch event per chunk range, each carrying only its
+        # own slice. The chunks are sent from inside this step so they never end up in
+        # its (size-limited) output; ids derived from the run make a retried step's
+        # re-sent events deduplicate instead of ingesting twice.
+        ranges = [[start, min(start + INGEST_BATCH_SIZE, len(chunks))]
+                  for start in range(0, len(chunks), INGEST_BATCH_SIZE)]
+        events = [
+            inngest.Event(
+                name='rag/ingest_batch',
+                id=f"{ctx.run_id}:{start}",
+                data=RAGChunkANDSrc(chunks=chunks[start:end], source_id=source_id,
+                                    tenant_id=tenant_id, start=start).model_dump()
+            )
+            for start, end in ranges
+        ]
+        if events:
+            await inngest_client.send(events)
+        return {"chunks": len(chunks), "ranges": ranges}
+
+    fanned_out = await step.run('chunk_and_fan_out', _chunk_and_fan_out)
+    # The batches run as their own functions; nothing is embedded yet at this point
+    return IngestScheduled(
+        scheduled=fanned_out["chunks"], batches=len(fanned_out["ranges"]), ranges=fanned_out["ranges"]
+    ).model_dump()
+
+
+@inngest_client.create_function(
+    fn_id='RAG: ingest batch',
+    trigger=inngest.TriggerEvent(event='rag/ingest_batch'),
+    concurrency=[
+        # Parallel batches per document, bounded so one large PDF can't take every slot
+        inngest.Concurrency(limit=INGEST_SOURCE_CONCURRENCY, key="event.data.tenant_id + ':' + event.data.source_id"),
+        inngest.Concurrency(limit=INGEST_GLOBAL_CONCURRENCY)
+    ]
+)
+async def rag_ingest_batch(ctx, step):
+    def _embed_and_store(batch: RAGChunkANDSrc):
+        vecs = embed_texts(batch.chunks)
+        ids = point_ids(batch.source_id, len(batch.chunks), batch.tenant_id, start=batch.start)
+        payloads = [{"source": batch.source_id, "text": chunk} for chunk in batch.chunks]
+        get_storage().upsert(ids, vecs, payloads, tenant_id=batch.tenant_id)
+        _invalidate_answers(batch.tenant_id)
+
+    async def _upsert() -> dict:
+        batch = RAGChunkANDSrc.model_validate(ctx.event.data)
+        # Off the event loop, so concurrent batches overlap and /query keeps flowing
+        await run_in_threadpool(_embed_and_store, batch)
+        return UpsertResult(ingested=len(batch.chunks)).model_dump()
+
+    return await step.run("embed_and_upsert", _upsert)
 
 
 @inngest_client.create_function(
@@ -80,47 +250,151 @@ async def rag_ingest_pdf(ctx, step):
     trigger=inngest.TriggerEvent(event='rag/query_pdf')
 )
 async def rag_query_pdf(ctx, step):
-    def _search(question: str, top_k: int = 5) -> dict:
-        query_vec = embed_texts([question])[0]
-        store = QdrantStorage()
-        found = store.search(query_vec, top_k=top_k)
-        return found  # Already a dict
-    
-    def _generate_answer(found: dict, question: str) -> str:
-        context_block = "\n\n".join(f"- {c}" for c in found["contexts"])
-        user_content = (
-            "Use the following context to answer the question.\n\n"
-            f"Context:\n{context_block}\n\n"
-            f"Question: {question}\n"
-            "Answer concisely using the context above."
-        )
-
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            max_tokens=1024,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "You answer questions using only the provided context."},
-                {"role": "user", "content": user_content}
-            ]
-        )
-        return response.choices[0].message.content.strip()
-    
     question = ctx.event.data['question']
-    top_k = ctx.event.data.get('top_k', 5)
+    top_k = _clamp_k(ctx.event.data.get('top_k', 5))
+    tenant_id = ctx.event.data.get('tenant_id', DEFAULT_TENANT)
+    source_filter = ctx.event.data.get('source_filter')
+    adaptive = ctx.event.data.get('adaptive', False)
+    if adaptive:
+        top_k = _clamp_k(ctx.event.data.get('max_k', 10))
 
-    found = await step.run('embed-and-search', lambda: _search(question, top_k))
-    answer = await step.run('llm-answer', lambda: _generate_answer(found, question))
+    found = await step.run('embed-and-search', lambda: _search_documents(question, top_k, tenant_id, source_filter))
+    if adaptive:
+        found = select_adaptive(found, min_k=_clamp_k(ctx.event.data.get('min_k', 1)), max_k=top_k)
+    answer = await step.run('llm-answer', lambda: _generate_answer(found["contexts"], question))
     
     return {
         "answer": answer,
         "sources": found["sources"],
+        "scores": found["scores"],
         "num_contexts": len(found["contexts"])
     }
 
 
-app = FastAPI()
+@inngest_client.create_function(
+    fn_id='RAG: Query batch',
+    trigger=inngest.TriggerEvent(event='rag/query_batch')
+)
+async def rag_query_batch(ctx, step):
+    questions = ctx.event.data['questions']
+    top_k = _clamp_k(ctx.event.data.get('top_k', 5))
+    tenant_id = ctx.event.data.get('tenant_id', DEFAULT_TENANT)
+    source_filter = ctx.event.data.get('source_filter')
+    adaptive = ctx.event.data.get('adaptive', False)
+    if adaptive:
+        top_k = _clamp_k(ctx.event.data.get('max_k', 10))
+
+    async def _answer_all(found_list: list[dict]) -> list[dict]:
+        results = [None] * len(questions)
+        async for index, result in _answer_batch(questions, found_list):
+            results[index] = {"question": questions[index], **result}
+        return results
+
+    found_list = await step.run(
+        'embed-and-search-batch',
+        lambda: _search_documents_batch(questions, top_k, tenant_id, source_filter)
+    )
+    if adaptive:
+        min_k = _clamp_k(ctx.event.data.get('min_k', 1))
+        found_list = [select_adaptive(found, min_k=min_k, max_k=top_k) for found in found_list]
+    results = await step.run('llm-answers', lambda: _answer_all(found_list))
+
+    return {"results": results}
+
+
+def _warmup():
+    """Import heavy modules and open client connections ahead of the first request"""
+    try:
+        get_storage()
+        get_openai_client()
+        get_async_openai_client()
+    except Exception as e:
+        logging.getLogger('uvicorn').warning(f"Startup warmup failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Qdrant local mode locks its directory to one process; a second worker can't open it
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1 and os.getenv("QDRANT_PATH") and os.getenv("VECTOR_BACKEND", "qdrant") == "qdrant":
+        raise RuntimeError(
+            f"QDRANT_PATH (Qdrant local mode) supports a single process, but WEB_CONCURRENCY={workers}; "
+            "use QDRANT_URL or VECTOR_BACKEND=embedded for multiple workers"
+        )
+    # Warm up in the background so the server (and /health) is up immediately
+    if os.getenv("STARTUP_WARMUP", "1") != "0":
+        asyncio.get_running_loop().run_in_executor(None, _warmup)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def get_tenant_id(x_tenant_id: str = Header(DEFAULT_TENANT)) -> str:
+    """Tenant (workspace) the request acts on, taken from the X-Tenant-ID header"""
+    tenant_id = x_tenant_id.strip()
+    if not tenant_id or len(tenant_id) > 128:
+        raise HTTPException(status_code=400, detail="Invalid X-Tenant-ID header")
+    return tenant_id
+
+
+admission = AdmissionController.from_env()
+
+
+def query_deadline(timeout: float | None = None) -> Deadline:
+    """
+    The query's deadline of `timeout` seconds (at most QUERY_TIMEOUT). Listed before
+    admission, so time spent queued for a slot counts against it.
+    """
+    return Deadline(min(timeout, QUERY_TIMEOUT) if timeout and timeout > 0 else QUERY_TIMEOUT)
+
+
+async def query_admission(request: Request):
+    """Admit an interactive query, or reject it with 429/503 + Retry-After"""
+    async with admission.admit("query", client_id(request)):
+        yield
+
+
+async def ingest_admission(request: Request):
+    """Admit a bulk ingest; lower priority than queries"""
+    async with admission.admit("ingest", client_id(request)):
+        yield
+
+
+async def request_profile(request: Request, response: Response,
+                          x_profile: str | None = Header(None), profile: str | None = None):
+    """Profile this request if asked to (X-Profile header or ?profile=cpu|memory); see profiling.py"""
+    mode = x_profile or profile
+    if not mode:
+        yield None
+        return
+    if not profiling.profiling_enabled():
+        raise HTTPException(status_code=403, detail="Profiling is disabled (set PROFILING_ENABLED=1)")
+    try:
+        session = profiling.begin(mode, f"{request.method} {request.url.path}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    response.headers["X-Profile-ID"] = session.profile_id
+    try:
+        yield session
+    finally:
+        path = profiling.end(session)
+        logging.getLogger('uvicorn').info(f"Profile of {session.label} saved to {path}")
+
+
+def _ingest_pdf(path: str, source_id: str, tenant_id: str) -> int:
+    """Chunk, embed and store a PDF (blocking); returns the number of chunks"""
+    chunks = load_and_chunk_pdf(path)
+    vecs = embed_texts(chunks)
+    ids = point_ids(source_id, len(chunks), tenant_id)
+    payloads = [{"source": source_id, "text": chunks[i]} for i in range(len(chunks))]
+    get_storage().upsert(ids, vecs, payloads, tenant_id=tenant_id)
+    _invalidate_answers(tenant_id)
+    return len(chunks)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -132,8 +406,8 @@ app.add_middleware(
 
 
 # NEW: Direct upload endpoint
-@app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+@app.post("/upload", dependencies=[Depends(ingest_admission), Depends(request_profile)])
+async def upload_pdf(file: UploadFile = File(...), tenant_id: str = Depends(get_tenant_id)):
     """Direct PDF upload endpoint that processes synchronously"""
     try:
         # Validate file type
@@ -149,21 +423,16 @@ async def upload_pdf(file: UploadFile = File(...)):
             tmp_path = tmp.name
         
         try:
-            # Process PDF
-            chunks = load_and_chunk_pdf(tmp_path)
+            # Process, embed and store off the event loop so other requests keep flowing
             source_id = file.filename
-            
-            # Embed and store
-            vecs = embed_texts(chunks)
-            ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, name=f"{source_id}:{i}")) for i in range(len(chunks))]
-            payloads = [{"source": source_id, "text": chunks[i]} for i in range(len(chunks))]
-            QdrantStorage().upsert(ids, vecs, payloads)
+            num_chunks = await run_in_threadpool(_ingest_pdf, tmp_path, source_id, tenant_id)
             
             return {
                 "status": "success",
                 "message": f"Successfully processed {file.filename}",
-                "chunks_processed": len(chunks),
-                "source_id": source_id
+                "chunks_processed": num_chunks,
+                "source_id": source_id,
+                "tenant_id": tenant_id
             }
         finally:
             # Clean up temp file
@@ -174,55 +443,84 @@ async def upload_pdf(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/query")
-async def query_documents(question: str, top_k: int = 5):
-    """Direct synchronous query endpoint - returns answer immediately"""
-    try:
-        # Search vector DB
-        query_vec = embed_texts([question])[0]
-        store = QdrantStorage()
-        found = store.search(query_vec, top_k=top_k)
-        
-        # Check if we got any results
-        if not found.get("contexts") or len(found["contexts"]) == 0:
-            return {
-                "status": "completed",
-                "answer": "I couldn't find any relevant information in the uploaded documents. Please upload documents first.",
-                "sources": [],
-                "num_contexts": 0
-            }
-        
-        # Generate answer with OpenAI
-        context_block = "\n\n".join(f"- {c}" for c in found["contexts"])
-        user_content = (
-            "Use the following context to answer the question.\n\n"
-            f"Context:\n{context_block}\n\n"
-            f"Question: {question}\n"
-            "Answer concisely using the context above."
-        )
+@app.post("/query", dependencies=[Depends(query_deadline), Depends(query_admission), Depends(request_profile)])
+async def query_documents(question: str, top_k: int = Query(5, ge=1, le=MAX_TOP_K), source_filter: str | None = None,
+                          adaptive: bool = False, min_k: int = Query(1, ge=1, le=MAX_TOP_K),
+                          max_k: int = Query(10, ge=1, le=MAX_TOP_K),
+                          deadline: Deadline = Depends(query_deadline), tenant_id: str = Depends(get_tenant_id)):
+    """
+    Direct synchronous query endpoint - returns answer immediately
 
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            max_tokens=1024,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "You answer questions using only the provided context."},
-                {"role": "user", "content": user_content}
-            ]
+    With adaptive=true, top_k is ignored: up to max_k hits are retrieved and the
+    similarity scores decide how many (at least min_k) go into the prompt.
+    Embedding, search and generation share one deadline of `timeout` seconds
+    (at most QUERY_TIMEOUT), counted from arrival including any admission
+    queueing; running out of time returns 504.
+    With SHARED_CACHE_PATH, answers are cached and identical in-flight queries
+    are answered once across all workers.
+    """
+    limit = max_k if adaptive else top_k
+
+    async def _run() -> dict:
+        # Search vector DB (only the caller's tenant, optionally a single document)
+        found = await run_in_threadpool(_search_documents, question, limit, tenant_id, source_filter, deadline)
+        if adaptive:
+            found = select_adaptive(found, min_k=min_k, max_k=max_k)
+
+        # Generate answer with OpenAI (or report that nothing relevant was found)
+        return await _answer(question, found, deadline, hedge=True)
+
+    try:
+        cache = get_shared_cache()
+        if cache is None:
+            return await _run()
+        key = cache_key(
+            "answer", tenant_id, await run_in_threadpool(cache.generation, tenant_id), question.strip(), limit, source_filter,
+            adaptive, min_k if adaptive else None, ANSWER_MODEL, SYSTEM_PROMPT
         )
-        answer = response.choices[0].message.content.strip()
-        
-        return {
-            "status": "completed",
-            "answer": answer,
-            "sources": found["sources"],
-            "num_contexts": len(found["contexts"])
-        }
+        return await cache.get_or_compute_answer(key, _run, deadline)
     except Exception as e:
+        # Upstream client timeouts surface as their own errors; the deadline decides
+        if isinstance(e, DeadlineExceeded) or deadline.expired:
+            raise HTTPException(status_code=504, detail=f"Query did not finish within {deadline.seconds:g}s")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/batch")
+async def query_batch(body: BatchQueryRequest, request: Request, tenant_id: str = Depends(get_tenant_id)):
+    """
+    Answer many questions in one round-trip.
+
+    All questions are embedded in one call and searched in one batched Qdrant
+    request; answers are generated concurrently and streamed back as NDJSON
+    lines ({"index": ..., "question": ..., **query result}) as each finishes.
+    """
+    questions = [q.strip() for q in body.questions]
+    if not questions or len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_QUESTIONS} questions")
+    # Reject up front (429/503); the slot itself is held while the response streams
+    admission.check("batch", client_id(request))
+
+    async def stream():
+        try:
+            async with admission.pools["batch"].slot():
+                limit = body.max_k if body.adaptive else body.top_k
+                found_list = await run_in_threadpool(
+                    _search_documents_batch, questions, limit, tenant_id, body.source_filter
+                )
+                if body.adaptive:
+                    found_list = [select_adaptive(f, min_k=body.min_k, max_k=body.max_k) for f in found_list]
+
+                async for index, result in _answer_batch(questions, found_list):
+                    yield json.dumps({"index": index, "question": questions[index], **result}) + "\n"
+        except HTTPException as e:
+            yield json.dumps({"status": "error", "message": e.detail}) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "message": str(e)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.get("/")
 @app.head("/")
 async def root():
@@ -234,6 +532,8 @@ async def root():
             "docs": "/docs",
             "health": "/health",
             "upload": "/upload",
+            "query": "/query",
+            "query_batch": "/query/batch",
             "inngest": "/api/inngest"
         }
     }
@@ -308,6 +608,7 @@ async def get_result(event_id: str):
                         "status": "completed",
                         "answer": output.get("answer", "No answer generated"),
                         "sources": output.get("sources", []),
+                        "scores": output.get("scores", []),
                         "num_contexts": output.get("num_contexts", 0)
                     }
                 else:
@@ -342,26 +643,75 @@ async def get_result(event_id: str):
         raise HTTPException(status_code=500, detail=f"Error fetching result: {str(e)}")
 
 
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "text"):
+    """Report of a profiled request (format=prof for the raw cProfile stats)"""
+    if not profiling.profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    path = profiling.report_path(profile_id, binary=format == "prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "prof":
+        return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+    return PlainTextResponse(path.read_text())
+
+
 @app.delete("/clear")
-async def clear_database():
-    """Clear all documents from Qdrant"""
+async def clear_database(tenant_id: str = Depends(get_tenant_id)):
+    """Clear the caller's documents from Qdrant"""
     try:
-        store = QdrantStorage()
-        # Delete collection
-        store.client.delete_collection(collection_name=store.collection_name)
-        
-        # Recreate empty collection
-        store.client.create_collection(
-            collection_name=store.collection_name,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
-        )
+        # Scoped delete by filter - the shared collection and its index stay in place
+        await run_in_threadpool(get_storage().delete_tenant, tenant_id)
+        await run_in_threadpool(_invalidate_answers, tenant_id)
         
         return {
             "status": "success",
-            "message": "All documents cleared from database"
+            "message": "All documents cleared from database",
+            "tenant_id": tenant_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-inngest.fast_api.serve(app, inngest_client, [rag_ingest_pdf, rag_query_pdf])
\ No newline at end of file
+def _snapshot_path(name: str, tenant_id: str) -> str:
+    """SNAPSHOT_DIR/<tenant>/<name>, so tenants can neither read nor overwrite each other's snapshots"""
+    if not re.fullmatch(r"[A-Za-z0-9._-]{1,128}", name) or name.strip(".") == "":
+        raise HTTPException(status_code=400, detail="Snapshot name may only contain letters, digits, '.', '_' and '-'")
+    # Tenant ids are free-form header values; hash them into a safe directory name
+    tenant_dir = hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()
+    return os.path.join(SNAPSHOT_DIR, tenant_dir, name)
+
+
+@app.post("/snapshot/export", dependencies=[Depends(ingest_admission)])
+async def export_snapshot(name: str, tenant_id: str = Depends(get_tenant_id)):
+    """Dump the caller's vectors and payloads to the caller's snapshot directory"""
+    from snapshot import export_snapshot as export
+
+    path = _snapshot_path(name, tenant_id)
+    try:
+        manifest = await run_in_threadpool(export, get_storage(), path, tenant_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "snapshot": name, "points": manifest["count"], "tenant_id": tenant_id}
+
+
+@app.post("/snapshot/import", dependencies=[Depends(ingest_admission)])
+async def import_snapshot(name: str, tenant_id: str = Depends(get_tenant_id)):
+    """Restore one of the caller's snapshots into its tenant - no re-parsing or re-embedding"""
+    from snapshot import import_snapshot as restore
+
+    path = _snapshot_path(name, tenant_id)
+    if not os.path.exists(os.path.join(path, "manifest.json")):
+        raise HTTPException(status_code=404, detail=f"Snapshot {name} not found")
+    try:
+        # Plain waiting upserts: bulk mode would pause indexing for every tenant
+        count = await run_in_threadpool(restore, get_storage(), path, tenant_id, bulk=False)
+        await run_in_threadpool(_invalidate_answers, tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "snapshot": name, "points": count, "tenant_id": tenant_id}
+
+
+inngest.fast_api.serve(app, inngest_client, [rag_ingest_pdf, rag_ingest_batch, rag_query_pdf, rag_query_batch])
\ No newline at end of file
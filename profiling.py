@@ -0,0 +1,135 @@
+"""
+Opt-in profiling of single API requests.
+
+A request sent with `X-Profile: cpu|memory` (or `?profile=cpu|memory`) runs under a
+profiler and its report is saved to PROFILE_DIR under a profile id, which the
+response returns in the X-Profile-ID header:
+
+    cpu     cProfile of the request, including work it hands to the threadpool
+            (since Python 3.12 cProfile sees every thread); report sorted by
+            cumulative time, plus a .prof file for snakeviz
+    memory  tracemalloc allocations made during the request, by source line
+
+Only enabled with PROFILING_ENABLED=1, and one request is profiled at a time
+(both profilers are process-wide, so reports can include other requests that
+ran concurrently). Requests without the flag run exactly as before.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+PROFILE_MODES = ("cpu", "memory")
+REPORT_LINES = 60
+TRACEMALLOC_FRAMES = 25
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another request is being profiled"""
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("PROFILING_ENABLED", "0") == "1"
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv("PROFILE_DIR", "data/profiles"))
+
+
+class ProfileSession:
+    def __init__(self, mode: str, label: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.label = label
+        self.profile_id = uuid.uuid4().hex
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == "cpu":
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError as e:  # e.g. the process already runs under a profiler
+                raise ProfilerBusy(str(e)) from None
+        else:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._baseline = tracemalloc.take_snapshot()
+
+    def stop(self) -> Path:
+        """Stop profiling and write the report; returns its path"""
+        elapsed = time.perf_counter() - self._started
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cpu":
+            self._profile.disable()
+            report = self._cpu_report()
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report = self._memory_report(snapshot, current, peak)
+
+        path = directory / f"{self.profile_id}.txt"
+        path.write_text(f"{self.label}  mode={self.mode}  wall={elapsed:.3f}s\n\n{report}")
+        return path
+
+    def _cpu_report(self) -> str:
+        stats = pstats.Stats(self._profile)
+        stats.dump_stats(profile_dir() / f"{self.profile_id}.prof")
+
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LINES)
+        return out.getvalue()
+
+    def _memory_report(self, snapshot: tracemalloc.Snapshot, current: int, peak: int) -> str:
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+        diff = snapshot.filter_traces(ignore).compare_to(self._baseline.filter_traces(ignore), "lineno")
+        lines = [
+            f"Traced memory at end: {current / 1024 / 1024:.1f} MB, peak: {peak / 1024 / 1024:.1f} MB",
+            "(allocations by the whole process while the request ran)",
+            "",
+            f"Top {REPORT_LINES} allocation changes by source line:",
+        ]
+        lines.extend(str(stat) for stat in diff[:REPORT_LINES])
+        return "\n".join(lines) + "\n"
+
+
+def begin(mode: str, label: str) -> ProfileSession:
+    """Start profiling the current request; raises ProfilerBusy if one is already running"""
+    session = ProfileSession(mode, label)  # validates the mode before taking the lock
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("Another request is being profiled; try again shortly")
+    try:
+        session.start()
+    except BaseException:
+        _busy.release()
+        raise
+    return session
+
+
+def end(session: ProfileSession) -> Path:
+    try:
+        return session.stop()
+    finally:
+        _busy.release()
+
+
+def report_path(profile_id: str, binary: bool = False) -> Path | None:
+    """Saved report (or .prof stats) for a profile id, if it exists"""
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+    path = profile_dir() / f"{profile_id}.{'prof' if binary else 'txt'}"
+    return path if path.exists() else None
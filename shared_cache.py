@@ -0,0 +1,192 @@
+"""
+Caches shared by every worker process on a box (uvicorn --workers N).
+
+One SQLite database in WAL mode (SHARED_CACHE_PATH) holds:
+    embeddings   float32 vectors by (provider, model, text), so identical texts are
+                 embedded once per box instead of once per worker
+    answers      /query results by (tenant, corpus generation, question, options)
+    inflight     short leases, so identical queries arriving at different workers
+                 at the same time are answered once and the others wait for it
+    generations  per-tenant counter bumped on every ingest or clear; answers are
+                 keyed by it, so changed documents never serve stale answers
+
+WAL lets readers in all processes proceed while one writer commits. Without
+SHARED_CACHE_PATH nothing is cached and every request does its own work.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from deadline import Deadline, time_left
+
+SQLITE_MAX_PARAMS = 900
+EMBED_CACHE_TTL = 86_400  # seconds
+ANSWER_CACHE_TTL = 3_600
+INFLIGHT_LEASE = 60  # a crashed worker's claim is taken over after this
+PRUNE_EVERY = 1_000  # writes between sweeps of expired rows
+POLL_INTERVAL = 0.05
+
+
+def cache_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class SharedCache:
+    def __init__(self, path: str | Path, embed_ttl: float = EMBED_CACHE_TTL,
+                 answer_ttl: float = ANSWER_CACHE_TTL, lease: float = INFLIGHT_LEASE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.embed_ttl = embed_ttl
+        self.answer_ttl = answer_ttl
+        self.lease = lease
+        self.owner = uuid.uuid4().hex  # identifies this process's in-flight claims
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS inflight (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS generations (tenant_id TEXT PRIMARY KEY, generation INTEGER NOT NULL);"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _wrote(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            now = time.time()
+            for table in ("embeddings", "answers", "inflight"):
+                conn.execute(f"DELETE FROM {table} WHERE expires < ?", (now,))
+
+    # -- embeddings --------------------------------------------------------
+
+    def get_vectors(self, keys: list[str]) -> dict[str, bytes]:
+        conn, now, found = self._connect(), time.time(), {}
+        for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+            batch = keys[start:start + SQLITE_MAX_PARAMS]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))}) AND expires >= ?",
+                [*batch, now]
+            )
+            found.update(rows)
+        return found
+
+    def put_vectors(self, vectors: dict[str, bytes]):
+        expires = time.time() + self.embed_ttl
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, expires) VALUES (?, ?, ?)",
+                [(key, vector, expires) for key, vector in vectors.items()]
+            )
+            self._wrote(conn)
+
+    # -- answers -----------------------------------------------------------
+
+    def generation(self, tenant_id: str) -> int:
+        row = self._connect().execute("SELECT generation FROM generations WHERE tenant_id = ?", (tenant_id,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_generation(self, tenant_id: str):
+        """Invalidate every cached answer of a tenant (its documents changed)"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO generations (tenant_id, generation) VALUES (?, 1) "
+                "ON CONFLICT (tenant_id) DO UPDATE SET generation = generation + 1",
+                (tenant_id,)
+            )
+
+    def get_answer(self, key: str) -> dict | None:
+        row = self._connect().execute(
+            "SELECT value FROM answers WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_answer(self, key: str, value: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.answer_ttl)
+            )
+            self._wrote(conn)
+
+    # -- in-flight deduplication -------------------------------------------
+
+    def claim(self, key: str) -> bool:
+        """Take the lease on `key` unless another live request (in any worker) holds it"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO inflight (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE inflight.expires < ?",
+                (key, self.owner, now + self.lease, now)
+            )
+            return cursor.rowcount == 1
+
+    def claimable(self, key: str) -> bool:
+        """Whether `key` has no live lease (read-only, so waiters don't take write locks)"""
+        row = self._connect().execute(
+            "SELECT 1 FROM inflight WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row is None
+
+    def release(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, self.owner))
+
+    async def get_or_compute_answer(self, key: str, compute, deadline: Deadline | None = None) -> dict:
+        """
+        Cached answer for `key`, or compute it once across all workers.
+
+        The first request claims the key and runs `compute()`; identical requests
+        poll (reads only) until its answer is stored, and try to take over only once
+        the lease is gone, i.e. it failed or lapsed. SQLite calls run in the
+        threadpool so a busy database never blocks the event loop.
+        """
+        claimable = True
+        while True:
+            cached = await run_in_threadpool(self.get_answer, key)
+            if cached is not None:
+                return cached
+            if claimable and await run_in_threadpool(self.claim, key):
+                try:
+                    value = await compute()
+                    await run_in_threadpool(self.put_answer, key, value)
+                    return value
+                finally:
+                    await run_in_threadpool(self.release, key)
+            time_left(deadline, "waiting for an identical query")
+            await asyncio.sleep(POLL_INTERVAL)
+            claimable = await run_in_threadpool(self.claimable, key)
+
+
+@lru_cache(maxsize=1)
+def get_shared_cache() -> SharedCache | None:
+    """Per-process handle on the box-wide cache, or None when SHARED_CACHE_PATH is unset"""
+    path = os.getenv("SHARED_CACHE_PATH")
+    if not path:
+        return None
+    return SharedCache(
+        path,
+        embed_ttl=float(os.getenv("EMBED_CACHE_TTL", EMBED_CACHE_TTL)),
+        answer_ttl=float(os.getenv("ANSWER_CACHE_TTL", ANSWER_CACHE_TTL)),
+        lease=float(os.getenv("INFLIGHT_LEASE", INFLIGHT_LEASE))
+    )
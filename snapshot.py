@@ -0,0 +1,152 @@
+"""
+Export and import the vector store without re-parsing PDFs or re-embedding.
+
+A snapshot is a directory:
+    manifest.json   format version, vector dimension, point count, tenant
+    vectors.npy     float32 matrix, row i belongs to line i of points.jsonl
+    points.jsonl    one {"id": ..., "payload": {...}} object per line
+
+Both files are written and read in batches, so memory stays flat regardless of
+corpus size. Usage:
+
+    python snapshot.py export snapshots/prod [--tenant default]
+    python snapshot.py import snapshots/prod [--tenant other] [--workers 4]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+
+from vector_db import VectorStorage, DEFAULT_TENANT, TENANT_FIELD
+
+SNAPSHOT_FORMAT = "rag-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def export_snapshot(storage: VectorStorage, path: str | Path, tenant_id: str | None = None,
+                    batch_size: int = SNAPSHOT_BATCH_SIZE) -> dict:
+    """Write every point (of one tenant, or all) to a snapshot directory; returns the manifest"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    # Sized up front so vectors stream straight into the file; points written
+    # concurrently with the export are left out rather than resizing it.
+    expected = storage.count(tenant_id)
+    vectors_out = np.lib.format.open_memmap(
+        path / "vectors.npy", mode="w+", dtype=np.float32, shape=(expected, storage.dim)
+    )
+    written = 0
+    with open(path / "points.jsonl", "w") as points_out:
+        for ids, vectors, payloads in storage.iter_points(tenant_id, batch_size):
+            take = min(len(ids), expected - written)
+            vectors_out[written:written + take] = vectors[:take]
+            for point_id, payload in zip(ids[:take], payloads[:take]):
+                points_out.write(json.dumps({"id": point_id, "payload": payload}) + "\n")
+            written += take
+            if written == expected:
+                break
+    vectors_out.flush()
+    del vectors_out
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "dim": storage.dim,
+        "count": written,  # authoritative; vectors.npy may have unused trailing rows
+        "tenant_id": tenant_id,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    (path / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def _read_batches(path: Path, count: int, batch_size: int):
+    vectors = np.load(path / "vectors.npy", mmap_mode="r")
+    with open(path / "points.jsonl") as points_in:
+        for start in range(0, count, batch_size):
+            points = [json.loads(line) for line in itertools.islice(points_in, min(batch_size, count - start))]
+            yield (
+                [p["id"] for p in points],
+                np.asarray(vectors[start:start + len(points)]),
+                [p["payload"] for p in points]
+            )
+
+
+def _upsert_batch(storage: VectorStorage, ids: list, vectors: np.ndarray, payloads: list[dict],
+                  tenant_id: str | None, wait: bool):
+    tenants = [p.get(TENANT_FIELD) or DEFAULT_TENANT for p in payloads]
+    if tenant_id is not None:
+        # Points restored into another tenant get new ids, so they never overwrite
+        # the originals when both tenants share one collection
+        ids = [
+            point_id if tenant == tenant_id else str(uuid.uuid5(uuid.NAMESPACE_URL, json.dumps([tenant_id, str(point_id)])))
+            for point_id, tenant in zip(ids, tenants)
+        ]
+        storage.upsert(ids, vectors, payloads, tenant_id=tenant_id, wait=wait)
+        return
+    # Keep each point's own tenant; upsert per run of points sharing one
+    start = 0
+    for tenant, group in itertools.groupby(tenants):
+        end = start + len(list(group))
+        storage.upsert(ids[start:end], vectors[start:end], payloads[start:end], tenant_id=tenant, wait=wait)
+        start = end
+
+
+def import_snapshot(storage: VectorStorage, path: str | Path, tenant_id: str | None = None,
+                    workers: int = 4, batch_size: int = SNAPSHOT_BATCH_SIZE, bulk: bool = True) -> int:
+    """
+    Load a snapshot into storage with parallel batched upserts; returns the point count.
+
+    With `tenant_id`, every point is restored into that tenant; otherwise points
+    keep the tenant they were exported from. With `bulk` (the CLI) it runs inside
+    `bulk_ingest()`, so indexing happens once at the end; that pauses indexing of
+    the whole shared collection, so the API imports with bulk=False and plain
+    waiting upserts instead.
+    """
+    path = Path(path)
+    manifest = json.loads((path / "manifest.json").read_text())
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} {SNAPSHOT_FORMAT} snapshot")
+    if manifest["dim"] != storage.dim:
+        raise ValueError(f"Snapshot holds {manifest['dim']}-dim vectors but storage expects {storage.dim}")
+
+    with storage.bulk_ingest() if bulk else nullcontext(), ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for ids, vectors, payloads in _read_batches(path, manifest["count"], batch_size):
+            pending.append(pool.submit(_upsert_batch, storage, ids, vectors, payloads, tenant_id, not bulk))
+            # Bound read-ahead so memory stays at a few batches per worker
+            if len(pending) >= workers * 2:
+                pending.pop(0).result()
+        for future in pending:
+            future.result()
+    return manifest["count"]
+
+
+def main():
+    from vector_db import get_storage
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--tenant", default=None, help="Export only / import into this tenant")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SNAPSHOT_WORKERS", 4)))
+    args = parser.parse_args()
+
+    if args.command == "export":
+        manifest = export_snapshot(get_storage(), args.path, args.tenant)
+        print(f"Exported {manifest['count']} points to {args.path}")
+    else:
+        count = import_snapshot(get_storage(), args.path, args.tenant, workers=args.workers)
+        print(f"Imported {count} points from {args.path}")
+
+
+if __name__ == "__main__":
+    main()
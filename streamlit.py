@@ -3,6 +3,7 @@ from pathlib import Path
 import time
 import base64
 import requests
+from requests.adapters import HTTPAdapter
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -161,6 +162,16 @@ def get_inngest_client():
     )
 
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Pooled HTTP session shared by all reruns, so backend calls reuse TLS connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def get_backend_url():
     """Get backend API URL"""
     try:
@@ -169,6 +180,15 @@ def get_backend_url():
         return os.getenv("BACKEND_URL", "https://documentai-416p.onrender.com")
 
 
+def get_tenant_headers() -> dict:
+    """Headers scoping backend calls to this deployment's tenant (workspace)"""
+    try:
+        tenant_id = st.secrets.get("TENANT_ID", "default")
+    except (AttributeError, FileNotFoundError):
+        tenant_id = os.getenv("TENANT_ID", "default")
+    return {"X-Tenant-ID": tenant_id}
+
+
 def save_uploaded_pdf(file) -> Path:
     uploads_dir = Path("uploads")
     uploads_dir.mkdir(parents=True, exist_ok=True)
@@ -200,6 +220,45 @@ def send_event_sync(event_name: str, data: dict) -> str:
     return loop.run_until_complete(_send())
 
 
+@st.fragment(run_every=3)
+def show_pending_answer(index: int):
+    """Poll for a pending answer, rerunning only this block (not the whole page) until it arrives"""
+    if index >= len(st.session_state.chat_history):
+        return
+    chat = st.session_state.chat_history[index]
+    if not chat.get("pending"):
+        return
+    event_id = chat.get('event_id')
+
+    result = None
+    try:
+        result_response = get_http_session().get(f"{get_backend_url()}/result/{event_id}", timeout=10)
+        if result_response.status_code == 200:
+            result = result_response.json()
+        note = "Auto-refreshing every 3 seconds..."
+    except requests.exceptions.RequestException:
+        note = "Checking for results... (will auto-refresh)"
+
+    if result and result.get('status') == 'completed':
+        st.session_state.chat_history[index] = {
+            "question": chat['question'],
+            "answer": result.get('answer', 'No answer generated'),
+            "sources": result.get('sources', []),
+            "scores": result.get('scores', []),
+            "pending": False
+        }
+        # One full rerun renders the answer and stops this fragment's polling
+        st.rerun()
+
+    st.markdown(f"""
+    <div class="info-box">
+        ⏳ <strong>Processing...</strong><br/>
+        Your question is being processed. Event ID: {event_id}<br/>
+        <small>{note}</small>
+    </div>
+    """, unsafe_allow_html=True)
+
+
 # Initialize session state
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
@@ -251,7 +310,9 @@ with st.sidebar:
             try:
                 with st.spinner("Clearing database..."):
                     backend_url = get_backend_url()
-                    response = requests.delete(f"{backend_url}/clear", timeout=30)
+                    response = get_http_session().delete(
+                        f"{backend_url}/clear", headers=get_tenant_headers(), timeout=30
+                    )
                     response.raise_for_status()
                     st.session_state.uploaded_docs = []
                     st.session_state.chat_history = []
@@ -293,7 +354,7 @@ with tab1:
     
     if uploaded is not None:
         # Show file info
-        file_size = len(uploaded.getvalue()) / (1024 * 1024)  # MB
+        file_size = uploaded.size / (1024 * 1024)  # MB
         st.markdown(f"""
         <div class="file-details">
             <strong>📎 File Details:</strong><br/>
@@ -313,12 +374,18 @@ with tab1:
                         progress_bar.progress(i + 1)
                     
                     try:
-                        # Prepare file for upload
-                        files = {"file": (uploaded.name, uploaded.getvalue(), "application/pdf")}
+                        # Prepare file for upload - the uploader buffer itself, not a copy of its bytes
+                        uploaded.seek(0)
+                        files = {"file": (uploaded.name, uploaded, "application/pdf")}
                         
                         # Send to backend API
                         backend_url = get_backend_url()
-                        response = requests.post(f"{backend_url}/upload", files=files, timeout=120)
+                        response = get_http_session().post(
+                            f"{backend_url}/upload",
+                            files=files,
+                            headers=get_tenant_headers(),
+                            timeout=120
+                        )
                         
                         for i in range(50, 100):
                             time.sleep(0.01)
@@ -365,56 +432,9 @@ with tab2:
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # Check if pending and try to fetch result
+                # Pending answers poll in their own fragment; the rest of the page stays put
                 if chat.get("pending"):
-                    event_id = chat.get('event_id')
-                    
-                    # Try to fetch result from backend
-                    try:
-                        backend_url = get_backend_url()
-                        result_response = requests.get(
-                            f"{backend_url}/result/{event_id}",
-                            timeout=10
-                        )
-                        
-                        if result_response.status_code == 200:
-                            result = result_response.json()
-                            
-                            # Check if the result is completed
-                            if result.get('status') == 'completed':
-                                # Update chat history with result
-                                st.session_state.chat_history[i] = {
-                                    "question": chat['question'],
-                                    "answer": result.get('answer', 'No answer generated'),
-                                    "sources": result.get('sources', []),
-                                    "pending": False
-                                }
-                                st.rerun()
-                            else:
-                                # Still processing - show with auto-refresh
-                                st.markdown(f"""
-                                <div class="info-box">
-                                    ⏳ <strong>Processing...</strong><br/>
-                                    Your question is being processed. Event ID: {event_id}<br/>
-                                    <small>Auto-refreshing every 3 seconds...</small>
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Auto-refresh after 3 seconds
-                                time.sleep(3)
-                                st.rerun()
-                    except Exception as e:
-                        st.markdown(f"""
-                        <div class="info-box">
-                            ⏳ <strong>Processing...</strong><br/>
-                            Event ID: {event_id}<br/>
-                            <small>Checking for results... (will auto-refresh)</small>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Auto-refresh after 3 seconds
-                        time.sleep(3)
-                        st.rerun()
+                    show_pending_answer(i)
                 else:
                     # Answer
                     st.markdown(f"""
@@ -427,8 +447,10 @@ with tab2:
                     # Sources
                     if chat.get("sources"):
                         with st.expander("📚 View Sources", expanded=False):
-                            for s in chat["sources"]:
-                                st.markdown(f'<div class="source-item">📄 {s}</div>', unsafe_allow_html=True)
+                            scores = chat.get("scores") or [None] * len(chat["sources"])
+                            for s, score in zip(chat["sources"], scores):
+                                score_text = f" (relevance {score:.2f})" if score is not None else ""
+                                st.markdown(f'<div class="source-item">📄 {s}{score_text}</div>', unsafe_allow_html=True)
                 
                 st.markdown("---")
     
@@ -466,6 +488,11 @@ with tab2:
                 value=5,
                 help="Number of relevant chunks to retrieve"
             )
+            adaptive = st.checkbox(
+                "Auto-select chunks",
+                value=False,
+                help="Let the backend pick how many chunks to use (up to the slider value) from their similarity scores"
+            )
             
             submitted = st.form_submit_button("🔍 Get Answer", type="primary", use_container_width=True)
         
@@ -479,14 +506,17 @@ with tab2:
                         "question": question.strip(),
                         "top_k": int(top_k)
                     }
+                    if adaptive:
+                        params.update({"adaptive": "true", "max_k": int(top_k)})
                     
                     # Add source filter if specific document selected
                     if selected_doc != "All Documents":
                         params["source_filter"] = selected_doc
                     
-                    response = requests.post(
+                    response = get_http_session().post(
                         f"{backend_url}/query",
                         params=params,
+                        headers=get_tenant_headers(),
                         timeout=60
                     )
                     response.raise_for_status()
@@ -497,6 +527,7 @@ with tab2:
                         "question": question.strip(),
                         "answer": result.get('answer', 'No answer generated'),
                         "sources": result.get('sources', []),
+                        "scores": result.get('scores', []),
                         "pending": False
                     })
                     
@@ -1,42 +1,368 @@
+import json
 import os
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from docstore import ChunkStore
+
+# qdrant_client is imported inside functions: it costs over a second of import time,
+# and keeping it off the import path lets the API answer /health right after a cold start.
+
+# Every point carries the id of the tenant (workspace) that owns it. Searches and
+# deletes are always scoped to one tenant, so tenants share a collection but never
+# see or clear each other's documents.
+TENANT_FIELD = "tenant_id"
+DEFAULT_TENANT = "default"
+UPSERT_BATCH_SIZE = 256
+SEARCH_BATCH_SIZE = 256
+DEFAULT_INDEXING_THRESHOLD = 20_000  # Qdrant's default, restored after a bulk load without a saved value
+
+# Adaptive retrieval defaults (cosine similarity, text-embedding-3-small)
+ADAPTIVE_MIN_SCORE = 0.25  # hits below this are noise
+ADAPTIVE_MIN_GAP = 0.08  # a drop this large after a hit means the hits above it are decisive
+
+
+def point_ids(source_id: str, count: int, tenant_id: str = DEFAULT_TENANT, start: int = 0) -> list[str]:
+    """Deterministic point ids for chunks start..start+count-1, so re-uploading a source overwrites its old chunks"""
+    if tenant_id == DEFAULT_TENANT:
+        # Original id scheme, so pre-tenant points get replaced. Its names end in ":<i>",
+        # so they can never equal the JSON names of other tenants below.
+        names = (f"{source_id}:{i}" for i in range(start, start + count))
+    else:
+        # Structured key: no choice of tenant or source name can collide with another's
+        names = (json.dumps([tenant_id, source_id, i]) for i in range(start, start + count))
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, name=name)) for name in names]
+
+
+def tenant_filter(tenant_id: str = DEFAULT_TENANT, source: str | None = None):
+    from qdrant_client.models import Filter, FieldCondition, MatchValue, IsEmptyCondition, PayloadField
+
+    if tenant_id == DEFAULT_TENANT:
+        # Points written before tenants existed have no tenant field; they belong to the default tenant
+        tenant_condition = Filter(should=[
+            FieldCondition(key=TENANT_FIELD, match=MatchValue(value=tenant_id)),
+            IsEmptyCondition(is_empty=PayloadField(key=TENANT_FIELD)),
+        ])
+    else:
+        tenant_condition = FieldCondition(key=TENANT_FIELD, match=MatchValue(value=tenant_id))
+
+    must = [tenant_condition]
+    if source:
+        must.append(FieldCondition(key="source", match=MatchValue(value=source)))
+    return Filter(must=must)
+
+
+# Payload fields a search returns; "text" is absent on points whose text lives in the docstore
+SEARCH_PAYLOAD = ["source", "text"]
+
+
+def _hits_to_result(hits, texts: dict[str, str] | None = None) -> dict:
+    contexts = [hit.payload["text"] if "text" in hit.payload else texts[str(hit.id)] for hit in hits]
+    sources = [hit.payload["source"] for hit in hits]
+    scores = [hit.score for hit in hits]
+    return {"contexts": contexts, "sources": sources, "scores": scores}
+
+
+class VectorStorage:
+    """
+    Interface shared by the storage backends (VECTOR_BACKEND):
+    `QdrantStorage` (Qdrant server, cloud or local mode) and
+    `embedded_store.EmbeddedStorage` (in-process index, no server).
+    """
+
+    dim: int
+
+    def upsert(self, ids: list[str], vectors: "np.ndarray", payloads: list[dict],
+               tenant_id: str = DEFAULT_TENANT, wait: bool = True):
+        """Insert or replace points; wait=False may return before they are searchable"""
+        raise NotImplementedError
+
+    def search(self, query_vector: "np.ndarray", top_k: int = 5,
+               tenant_id: str = DEFAULT_TENANT, source: str | None = None,
+               timeout: int | None = None) -> dict:
+        """Top hits for one vector; `timeout` (seconds) bounds remote backends"""
+        raise NotImplementedError
+
+    def search_batch(self, query_vectors: "np.ndarray", top_k: int = 5,
+                     tenant_id: str = DEFAULT_TENANT, source: str | None = None) -> list[dict]:
+        return [self.search(vector, top_k, tenant_id, source) for vector in query_vectors]
+
+    def delete_tenant(self, tenant_id: str = DEFAULT_TENANT):
+        raise NotImplementedError
+
+    def count(self, tenant_id: str | None = None) -> int:
+        """Number of stored points, for one tenant or (None) all of them"""
+        raise NotImplementedError
+
+    def iter_points(self, tenant_id: str | None = None, batch_size: int = 1000):
+        """Yield (ids, float32 vectors, payloads) batches of stored points, for one tenant or all"""
+        raise NotImplementedError
+
+    @contextmanager
+    def bulk_ingest(self):
+        """Context for loading many points at once; backends defer index maintenance inside it"""
+        yield self
+
+
+class QdrantStorage(VectorStorage):
+    """
+    Qdrant-backed storage. With a `docstore`, chunk texts are kept there instead of in
+    the point payloads, so Qdrant holds only vectors and the small filter fields.
+    """
+
+    def __init__(self, dim: int = 1536, collection_name: str | None = None,
+                 docstore: "ChunkStore | None" = None):
+        from qdrant_client import QdrantClient
 
-class QdrantStorage:
-    def __init__(self):
         qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
         qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        
-        # Connect to Qdrant (Cloud or local)
-        if qdrant_api_key:
+        qdrant_path = os.getenv("QDRANT_PATH")
+
+        # Connect to Qdrant (Cloud, server, or local mode on disk without a server)
+        if qdrant_path:
+            self.client = QdrantClient(path=qdrant_path)
+        elif qdrant_api_key:
             self.client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
         else:
             self.client = QdrantClient(url=qdrant_url)
-            
-        self.collection_name = "rag_documents"
+
+        self.collection_name = collection_name or os.getenv("QDRANT_COLLECTION", "rag_documents")
+        self.dim = dim
+        self.docstore = docstore
+        self._bulk_lock = threading.Lock()
+        self._bulk_depth = 0
+        self._saved_indexing_threshold = None
+        # Local mode edits in-process arrays that are not safe to write from several threads
+        self._write_lock = threading.Lock() if qdrant_path else nullcontext()
         self._ensure_collection()
 
     def _ensure_collection(self):
+        from qdrant_client.models import VectorParams, Distance
+
         collections = self.client.get_collections().collections
         if not any(c.name == self.collection_name for c in collections):
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
+                vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE)
+            )
+
+        info = self.client.get_collection(self.collection_name)
+        stored_dim = info.config.params.vectors.size
+        if stored_dim != self.dim:
+            raise ValueError(
+                f"Collection '{self.collection_name}' holds {stored_dim}-dim vectors but the embedding "
+                f"backend produces {self.dim}-dim vectors; set QDRANT_COLLECTION to a separate collection"
             )
+        self._ensure_tenant_index(info)
 
-    def upsert(self, ids: list[str], vectors: list[list[float]], payloads: list[dict]):
-        points = [
-            PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i])
-            for i in range(len(ids))
-        ]
-        self.client.upsert(collection_name=self.collection_name, points=points)
+    def _ensure_tenant_index(self, info):
+        from qdrant_client.models import KeywordIndexParams, KeywordIndexType
 
-    def search(self, query_vector: list[float], top_k: int = 5) -> dict:
+        if TENANT_FIELD in (info.payload_schema or {}):
+            return
+        # is_tenant lets Qdrant co-locate each tenant's points, keeping filtered search fast
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name=TENANT_FIELD,
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True)
+        )
+
+    def upsert(self, ids: list[str], vectors: "np.ndarray", payloads: list[dict],
+               tenant_id: str = DEFAULT_TENANT, wait: bool = True):
+        if self.docstore is not None:
+            # Texts are stored first, so a search never finds a point without its text
+            self.docstore.put_many(ids, [payload["text"] for payload in payloads], tenant_id)
+            payloads = [{k: v for k, v in payload.items() if k != "text"} for payload in payloads]
+        # upload_collection slices the float32 array per batch, so only one batch at a
+        # time is ever expanded into Python floats for the request body
+        with self._write_lock:
+            self.client.upload_collection(
+                collection_name=self.collection_name,
+                vectors=vectors,
+                payload=[{**payload, TENANT_FIELD: tenant_id} for payload in payloads],
+                ids=ids,
+                batch_size=UPSERT_BATCH_SIZE,
+                # Bulk loaders pass wait=False; bulk_ingest waits once at the end
+                wait=wait
+            )
+
+    def search(self, query_vector: "np.ndarray", top_k: int = 5,
+               tenant_id: str = DEFAULT_TENANT, source: str | None = None,
+               timeout: int | None = None) -> dict:
         results = self.client.search(
             collection_name=self.collection_name,
             query_vector=query_vector,
-            limit=top_k
+            query_filter=tenant_filter(tenant_id, source),
+            limit=top_k,
+            with_payload=SEARCH_PAYLOAD,
+            timeout=timeout
+        )
+        return _hits_to_result(results, self._fetch_texts(results))
+
+    def search_batch(self, query_vectors: "np.ndarray", top_k: int = 5,
+                     tenant_id: str = DEFAULT_TENANT, source: str | None = None) -> list[dict]:
+        """Run many searches in one request per SEARCH_BATCH_SIZE queries"""
+        from qdrant_client.models import SearchRequest
+
+        query_filter = tenant_filter(tenant_id, source)
+        found = []
+        for start in range(0, len(query_vectors), SEARCH_BATCH_SIZE):
+            requests = [
+                SearchRequest(vector=vector.tolist(), filter=query_filter, limit=top_k, with_payload=SEARCH_PAYLOAD)
+                for vector in query_vectors[start:start + SEARCH_BATCH_SIZE]
+            ]
+            results = self.client.search_batch(collection_name=self.collection_name, requests=requests)
+            texts = self._fetch_texts([hit for hits in results for hit in hits])
+            found.extend(_hits_to_result(hits, texts) for hits in results)
+        return found
+
+    def _fetch_texts(self, points) -> dict[str, str]:
+        """Docstore texts of the points (hits or records) whose payload has none, in one lookup"""
+        missing = [str(point.id) for point in points if "text" not in point.payload]
+        if not missing:
+            return {}
+        texts = self.docstore.get_many(missing) if self.docstore is not None else {}
+        if len(texts) < len(set(missing)):
+            raise LookupError("Chunk text missing for stored points; is DOCSTORE_PATH set to the right file?")
+        return texts
+
+    def delete_tenant(self, tenant_id: str = DEFAULT_TENANT):
+        """Remove every point owned by a tenant; other tenants' points and indexes are untouched"""
+        from qdrant_client.models import FilterSelector
+
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=tenant_filter(tenant_id)),
+            wait=True
         )
-        contexts = [hit.payload["text"] for hit in results]
-        sources = [hit.payload["source"] for hit in results]
-        return {"contexts": contexts, "sources": sources}
+        if self.docstore is not None:
+            self.docstore.delete_tenant(tenant_id)
+
+    def count(self, tenant_id: str | None = None) -> int:
+        count_filter = tenant_filter(tenant_id) if tenant_id is not None else None
+        return self.client.count(self.collection_name, count_filter=count_filter, exact=True).count
+
+    def iter_points(self, tenant_id: str | None = None, batch_size: int = 1000):
+        import numpy as np
+
+        scroll_filter = tenant_filter(tenant_id) if tenant_id is not None else None
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if records:
+                texts = self._fetch_texts(records)
+                yield (
+                    [str(r.id) for r in records],
+                    np.asarray([r.vector for r in records], dtype=np.float32),
+                    [r.payload if "text" in r.payload else {**r.payload, "text": texts[str(r.id)]} for r in records]
+                )
+            if offset is None:
+                return
+
+    @contextmanager
+    def bulk_ingest(self, index_timeout: float | None = None):
+        """
+        Defer HNSW indexing while a large load streams in.
+
+        Sets indexing_threshold=0 so Qdrant stops building the graph for incoming
+        segments; loaders inside it can upsert with wait=False. On exit the previous threshold
+        is restored and this blocks until the collection is indexed (status green)
+        or `index_timeout` passes. Nested and concurrent bulk loads in this process
+        share one window. Searches keep working meanwhile; new points are scanned
+        exactly until they are indexed.
+        """
+        from qdrant_client.models import OptimizersConfigDiff
+
+        with self._bulk_lock:
+            if self._bulk_depth == 0:
+                info = self.client.get_collection(self.collection_name)
+                self._saved_indexing_threshold = info.config.optimizer_config.indexing_threshold
+                self.client.update_collection(
+                    collection_name=self.collection_name,
+                    optimizers_config=OptimizersConfigDiff(indexing_threshold=0)
+                )
+            self._bulk_depth += 1
+
+        try:
+            yield self
+        finally:
+            with self._bulk_lock:
+                self._bulk_depth -= 1
+                last = self._bulk_depth == 0
+                if last:
+                    self.client.update_collection(
+                        collection_name=self.collection_name,
+                        optimizers_config=OptimizersConfigDiff(
+                            indexing_threshold=self._saved_indexing_threshold or DEFAULT_INDEXING_THRESHOLD
+                        )
+                    )
+            if last:
+                timeout = index_timeout if index_timeout is not None else float(os.getenv("BULK_INDEX_TIMEOUT", 600))
+                self.wait_until_indexed(timeout)
+
+    def wait_until_indexed(self, timeout: float = 600, poll_interval: float = 0.5) -> bool:
+        """Block until optimizations finish (status green); returns False on timeout"""
+        from qdrant_client.models import CollectionStatus
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.client.get_collection(self.collection_name).status == CollectionStatus.GREEN:
+                return True
+            time.sleep(poll_interval)
+        return False
+
+
+def adaptive_cutoff(scores: list[float], min_k: int = 1, max_k: int = 20,
+                    min_score: float = ADAPTIVE_MIN_SCORE, min_gap: float = ADAPTIVE_MIN_GAP) -> int:
+    """
+    Pick how many of the (descending) hits to keep from their similarity scores.
+
+    Keeps at most `max_k` hits, drops hits under `min_score`, and stops at the first
+    score gap of at least `min_gap`. When the top hits are decisive only they are
+    kept; when scores are flat more context is kept. Never returns fewer than
+    `min_k` (if that many hits exist).
+    """
+    k = 0
+    for i, score in enumerate(scores[:max_k]):
+        if score < min_score:
+            break
+        if i > 0 and scores[i - 1] - score >= min_gap:
+            break
+        k = i + 1
+    return max(k, min(min_k, len(scores)))
+
+
+def select_adaptive(found: dict, min_k: int = 1, max_k: int = 20,
+                    min_score: float = ADAPTIVE_MIN_SCORE, min_gap: float = ADAPTIVE_MIN_GAP) -> dict:
+    """Trim a `search` result to the depth chosen by `adaptive_cutoff`"""
+    k = adaptive_cutoff(found["scores"], min_k, max_k, min_score, min_gap)
+    return {key: values[:k] for key, values in found.items()}
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> VectorStorage:
+    """Process-wide storage; connects and checks the collection once instead of per request"""
+    from embeddings import get_embedding_provider
+    from docstore import get_docstore
+
+    dim = get_embedding_provider().dim
+    backend = os.getenv("VECTOR_BACKEND", "qdrant")
+    if backend == "qdrant":
+        return QdrantStorage(dim=dim, docstore=get_docstore())
+    if backend == "embedded":
+        from embedded_store import EmbeddedStorage
+        return EmbeddedStorage(dim=dim)
+    raise ValueError(f"Unknown VECTOR_BACKEND '{backend}' (expected 'qdrant' or 'embedded')")